@@ -0,0 +1,75 @@
+"""
+Ansible callback that records per-task timings for the boot profiler.
+
+Each finished task is appended as one JSON line to the file named by
+BOOT_TIMINGS_ANSIBLE_LOG (default /var/log/bootstrap-ansible-timings.jsonl).
+Enable with ANSIBLE_CALLBACKS_ENABLED=boot_timings. When run by
+boot_orchestrator.py, BOOT_TIMINGS_STEP names the boot step the tasks
+belong to.
+"""
+
+import json
+import os
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+DEFAULT_LOG = '/var/log/bootstrap-ansible-timings.jsonl'
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'boot_timings'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super().__init__()
+        self._log_path = os.environ.get('BOOT_TIMINGS_ANSIBLE_LOG', DEFAULT_LOG)
+        self._step = os.environ.get('BOOT_TIMINGS_STEP', '')
+        self._started = {}
+
+    def _record(self, result, status):
+        """Write the timing line for a finished task."""
+        task = result._task
+        start = self._started.pop(task._uuid, None)
+        if start is None:
+            return
+
+        path = task.get_path() or ''
+        task_file = os.path.basename(path.split(':')[0])
+
+        entry = {
+            'task': task.get_name(),
+            'path': path,
+            'file': os.path.splitext(task_file)[0],
+            'tags': sorted(task.tags),
+            'start': start,
+            'end': time.time(),
+            'status': status,
+            'step': self._step,
+        }
+
+        try:
+            with open(self._log_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            self._display.warning(f"boot_timings: could not write {self._log_path}: {e}")
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._started[task._uuid] = time.time()
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self._started[task._uuid] = time.time()
+
+    def v2_runner_on_ok(self, result):
+        self._record(result, 'changed' if result._result.get('changed') else 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result, 'ignored' if ignore_errors else 'failed')
+
+    def v2_runner_on_skipped(self, result):
+        self._record(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        self._record(result, 'unreachable')
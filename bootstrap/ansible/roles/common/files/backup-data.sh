@@ -16,17 +16,28 @@ if [ ! -d "${DATA_DIR}" ]; then
     exit 0
 fi
 
+# A partly restored ~/data must not become the latest full snapshot, or the
+# next boot would restore only part of it (see restore-lazy). Exit non-zero
+# so callers such as backup-watch know nothing was backed up.
+RESTORE_STATUS="/var/lib/devbox-restore/status.json"
+if [ -f "${RESTORE_STATUS}" ]; then
+    RESTORE_PHASE=$(jq -r '.phase' "${RESTORE_STATUS}")
+    if [ "${RESTORE_PHASE}" != "done" ]; then
+        echo "~/data restore is ${RESTORE_PHASE}, skipping full backup" >&2
+        exit 75
+    fi
+fi
+
 # Initialize repo if needed
 if ! restic snapshots &>/dev/null; then
     echo "Initializing restic repository..."
     restic init
 fi
 
+# Full scan of ~/data. Changes in between are backed up incrementally by
+# backup-watch; pruning is done separately by prune-data.
 echo "Backing up ~/data..."
 restic backup "${DATA_DIR}" --tag data --verbose
 
-echo "Cleaning up old snapshots..."
-restic forget --tag data --keep-last 10 --keep-daily 7 --keep-weekly 4 --prune
-
 echo "Data backup complete"
 restic snapshots --tag data
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Watch ~/data with inotify and back up changed paths incrementally.
+
+Changed paths are collected and debounced, then backed up as a single
+restic snapshot tagged data-incr containing only those paths. This avoids
+walking the whole tree every time and brings the RPO down to seconds.
+Full snapshots (backup-data) and pruning (prune-data) run on their own,
+much less frequent timers.
+
+If the kernel event queue overflows or too many paths change at once, a
+full backup is run instead. Deletions are not recorded by incremental
+snapshots; the next full backup picks them up.
+
+inotify is used rather than fanotify because fanotify needs
+CAP_SYS_ADMIN and this runs as the debian user.
+"""
+
+import argparse
+import ctypes
+import errno
+import json
+import os
+import select
+import struct
+import subprocess
+import sys
+import time
+
+import devbox_restic
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONTFOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    | IN_ONLYDIR | IN_DONTFOLLOW | IN_EXCL_UNLINK
+)
+
+# Events that mean the named path has new content to back up
+CHANGE_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+DEFAULT_DATA_DIR = os.path.expanduser('~/data')
+DEFAULT_FULL_BACKUP = os.path.expanduser('~/bin/backup-data')
+
+# Written by restore-lazy while ~/data is being restored in the background
+RESTORE_STATUS_FILE = '/var/lib/devbox-restore/status.json'
+
+
+class Inotify:
+    """Minimal recursive inotify watcher using libc through ctypes."""
+
+    def __init__(self):
+        self._libc = ctypes.CDLL('libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.paths = {}
+        self.watch_limit_hit = False
+
+    def add_watch(self, path):
+        """Watch a single directory. Returns False if it could not be watched."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC and not self.watch_limit_hit:
+                self.watch_limit_hit = True
+                print(f"Warning: inotify watch limit reached at {path}; raise "
+                      f"fs.inotify.max_user_watches. Unwatched changes are only "
+                      f"caught by the full backup.", file=sys.stderr, flush=True)
+            return False
+        self.paths[wd] = path
+        return True
+
+    def add_tree(self, root):
+        """Watch a directory and everything below it. Returns directories added."""
+        added = []
+        for dirpath, dirnames, _ in os.walk(root):
+            if self.add_watch(dirpath):
+                added.append(dirpath)
+            # Symlinked directories are backed up as links, not followed
+            dirnames[:] = [d for d in dirnames if not os.path.islink(os.path.join(dirpath, d))]
+        return added
+
+    def read_events(self, timeout):
+        """
+        Wait up to timeout seconds and yield (mask, path) for each event.
+        path is None for queue overflow.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                yield mask, None
+                continue
+
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+                continue
+
+            directory = self.paths.get(wd)
+            if directory is None:
+                continue
+
+            yield mask, os.path.join(directory, os.fsdecode(name)) if name else directory
+
+
+def collapse_paths(paths):
+    """
+    Drop paths that are inside another path in the set (restic backs up
+    directories recursively) and paths that no longer exist.
+    """
+    kept = []
+    for path in sorted(paths):
+        if kept and (path == kept[-1] or path.startswith(kept[-1].rstrip('/') + '/')):
+            continue
+        if os.path.lexists(path):
+            kept.append(path)
+    return kept
+
+
+def run_full_backup(command):
+    """Run the full backup script (also used after queue overflow)."""
+    print(f"Running full backup: {command}", flush=True)
+    return subprocess.run([command]).returncode
+
+
+def run_incremental_backup(paths, env):
+    """Back up only the changed paths as a data-incr snapshot."""
+    print(f"Backing up {len(paths)} changed path(s)...", flush=True)
+    started = time.monotonic()
+    rc = devbox_restic.backup_paths(paths, devbox_restic.DATA_INCR_TAG, env)
+    elapsed = time.monotonic() - started
+
+    if rc == 0:
+        print(f"Incremental backup complete ({elapsed:.1f}s)", flush=True)
+    elif rc == 3:
+        print(f"Incremental backup complete with unreadable files ({elapsed:.1f}s)", flush=True)
+    else:
+        print(f"Incremental backup failed (rc={rc})", file=sys.stderr, flush=True)
+    return rc in (0, 3)
+
+
+def wait_for_restore(status_file, interval=10):
+    """
+    Wait for a background restore of ~/data to finish, so restored files
+    are not backed up again as changes. Returns True if it had to wait.
+    """
+    waited = False
+    while True:
+        try:
+            with open(status_file) as f:
+                phase = json.load(f).get('phase')
+        except (OSError, ValueError):
+            return waited
+        if phase in ('done', 'failed'):
+            return waited
+        if not waited:
+            print("Waiting for the background restore of ~/data to finish...", flush=True)
+            waited = True
+        time.sleep(interval)
+
+
+def watch(data_dir, debounce, max_delay, max_paths, full_backup, env):
+    """
+    Main loop: collect changes, then back up once the tree has been quiet
+    for `debounce` seconds or `max_delay` seconds after the first change.
+    """
+    inotify = Inotify()
+    inotify.add_tree(data_dir)
+    print(f"Watching {data_dir} ({len(inotify.paths)} directories)", flush=True)
+
+    pending = set()
+    first_change = None
+    last_change = None
+    overflowed = False
+    retry_at = 0
+
+    while True:
+        now = time.monotonic()
+        if pending or overflowed:
+            wait = max(min(last_change + debounce, first_change + max_delay), retry_at) - now
+            timeout = max(wait, 0)
+        else:
+            timeout = None
+
+        for mask, path in inotify.read_events(timeout):
+            now = time.monotonic()
+            if path is None:
+                print("Warning: inotify queue overflowed, falling back to full backup", file=sys.stderr, flush=True)
+                overflowed = True
+                # Directories created during the overflow have no watch yet
+                inotify.add_tree(data_dir)
+            elif mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # New directory: watch it, and back it up whole since files
+                # may have landed in it before the watch was added
+                inotify.add_tree(path)
+                pending.add(path)
+            elif mask & CHANGE_MASK:
+                pending.add(path)
+            else:
+                # Deletions and moves away leave nothing to back up; the
+                # next full backup records them
+                continue
+
+            first_change = first_change or now
+            last_change = now
+
+        if not (pending or overflowed):
+            continue
+
+        now = time.monotonic()
+        if now < retry_at or (now - last_change < debounce and now - first_change < max_delay):
+            continue
+
+        paths = collapse_paths(pending)
+        if overflowed or len(paths) > max_paths:
+            ok = run_full_backup(full_backup) == 0
+            if not ok and not overflowed and paths:
+                # e.g. skipped while ~/data is only partly restored; the
+                # changed paths are still known, so back them up directly
+                ok = run_incremental_backup(paths, env)
+        elif paths:
+            ok = run_incremental_backup(paths, env)
+        else:
+            ok = True
+
+        if ok:
+            pending.clear()
+            overflowed = False
+            first_change = None
+            last_change = None
+        else:
+            # Keep the paths and retry after max_delay
+            retry_at = time.monotonic() + max_delay
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description='Watch ~/data and back up changed paths incrementally with restic.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s                          # Watch ~/data with default timings
+  %(prog)s --debounce 2 --max-delay 30
+        '''
+    )
+
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help=f'Directory to watch (default: {DEFAULT_DATA_DIR})')
+    parser.add_argument('--debounce', type=float, default=5,
+                        help='Seconds without changes before backing up (default: 5)')
+    parser.add_argument('--max-delay', type=float, default=60,
+                        help='Maximum seconds between first change and backup (default: 60)')
+    parser.add_argument('--max-paths', type=int, default=10000,
+                        help='Run a full backup instead if more paths changed (default: 10000)')
+    parser.add_argument('--full-backup', default=DEFAULT_FULL_BACKUP,
+                        help=f'Full backup command (default: {DEFAULT_FULL_BACKUP})')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    env = devbox_restic.restic_env('data')
+    if env is None:
+        print("No restic bucket or password configured in SSM", file=sys.stderr)
+        sys.exit(1)
+
+    if not devbox_restic.ensure_repo(env):
+        print("Could not access or initialise the restic repository", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        # Changes made while the restore ran were not watched; a full scan
+        # picks them up
+        if wait_for_restore(RESTORE_STATUS_FILE):
+            run_full_backup(args.full_backup)
+        watch(args.data_dir, args.debounce, args.max_delay, args.max_paths, args.full_backup, env)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,156 @@
+"""
+Shared restic helpers for the devbox Python tools.
+
+Mirrors the shell scripts: the bucket and password come from SSM and the
+repository lives at s3:s3.<region>.amazonaws.com/<bucket>/restic/<name>.
+"""
+
+import json
+import os
+import re
+import subprocess
+import tempfile
+from datetime import datetime
+
+REGION = os.environ.get('AWS_DEFAULT_REGION', 'eu-west-2')
+
+# Snapshots searched per restic find run, to keep the command line short
+SNAPSHOTS_PER_FIND = 100
+
+# Snapshot tags for ~/data. Full snapshots cover the whole tree; incremental
+# snapshots only contain paths that changed since, and are replayed on top
+# of the latest full snapshot at restore time.
+DATA_TAG = 'data'
+DATA_INCR_TAG = 'data-incr'
+
+
+def get_ssm_parameter(name, decrypt=False):
+    """Read an SSM parameter with the AWS CLI. Returns None if unavailable."""
+    cmd = ['aws', 'ssm', 'get-parameter', '--name', name, '--region', REGION,
+           '--query', 'Parameter.Value', '--output', 'text']
+    if decrypt:
+        cmd.append('--with-decryption')
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def restic_env(repo_name):
+    """
+    Build the environment for running restic against the named repository
+    ('data' or 'config'). Returns None if SSM has no bucket or password.
+    """
+    bucket = get_ssm_parameter('/devbox/restic/bucket')
+    password = get_ssm_parameter('/devbox/restic/password', decrypt=True)
+    if not bucket or not password:
+        return None
+
+    env = dict(os.environ)
+    env['RESTIC_REPOSITORY'] = f"s3:s3.{REGION}.amazonaws.com/{bucket}/restic/{repo_name}"
+    env['RESTIC_PASSWORD'] = password
+    return env
+
+
+def run_restic(args, env, **kwargs):
+    """Run restic with the given arguments and environment."""
+    return subprocess.run(['restic'] + list(args), env=env, **kwargs)
+
+
+def ensure_repo(env):
+    """Initialise the repository if it does not exist yet."""
+    if run_restic(['cat', 'config'], env, capture_output=True).returncode == 0:
+        return True
+    print("Initializing restic repository...", flush=True)
+    return run_restic(['init'], env).returncode == 0
+
+
+def backup_paths(paths, tag, env, timeout=None):
+    """
+    Back up an explicit list of paths as one snapshot with the given tag.
+    Paths are passed NUL-separated so any file name is safe.
+    Returns the restic exit code (3 means the snapshot was created but some
+    files could not be read, e.g. they were deleted mid-backup), or None if
+    the timeout expired before restic finished.
+    """
+    with tempfile.NamedTemporaryFile('wb', prefix='restic-paths-', delete=False) as f:
+        f.write(b'\0'.join(os.fsencode(p) for p in paths))
+        list_path = f.name
+
+    try:
+        result = run_restic(['backup', '--tag', tag, '--files-from-raw', list_path], env, timeout=timeout)
+        return result.returncode
+    except subprocess.TimeoutExpired:
+        return None
+    finally:
+        os.unlink(list_path)
+
+
+def parse_time(value):
+    """Parse an RFC 3339 time from restic (which uses nanoseconds) to a datetime."""
+    stamp = re.sub(r'(\.\d{6})\d*', r'\1', value)
+    return datetime.fromisoformat(stamp.replace('Z', '+00:00'))
+
+
+def snapshot_time(snapshot):
+    """Return a snapshot's time as a datetime."""
+    return parse_time(snapshot['time'])
+
+
+def list_snapshots(env, tag):
+    """Return snapshots with the given tag, oldest first."""
+    result = run_restic(['snapshots', '--tag', tag, '--json'], env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return []
+    return sorted(json.loads(result.stdout or '[]'), key=snapshot_time)
+
+
+def restore_chain(env):
+    """
+    Return the snapshots to restore, in order: the latest full data snapshot
+    followed by every incremental snapshot taken after it.
+    """
+    full = list_snapshots(env, DATA_TAG)
+    if not full:
+        return []
+
+    latest = full[-1]
+    incrementals = [s for s in list_snapshots(env, DATA_INCR_TAG) if snapshot_time(s) > snapshot_time(latest)]
+    return [latest] + incrementals
+
+
+def list_nodes(env, snapshot_id):
+    """
+    Return every node (dicts with path, type, size, mtime, ...) in a
+    snapshot: files, directories, symlinks and special files.
+    """
+    result = run_restic(['ls', '--json', snapshot_id], env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return []
+
+    nodes = []
+    for line in result.stdout.splitlines():
+        node = json.loads(line)
+        if node.get('struct_type') == 'node':
+            nodes.append(node)
+    return nodes
+
+
+def find_nodes(env, snapshot_ids):
+    """
+    Return every node in each of the given snapshots as {snapshot id: [node]}.
+    Uses restic find, which loads the index once for many snapshots instead
+    of once per snapshot as restic ls does.
+    """
+    found = {}
+    for i in range(0, len(snapshot_ids), SNAPSHOTS_PER_FIND):
+        args = ['find', '--json']
+        for snapshot_id in snapshot_ids[i:i + SNAPSHOTS_PER_FIND]:
+            args += ['--snapshot', snapshot_id]
+        result = run_restic(args + ['*'], env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"restic find failed: {result.stderr.strip()}")
+        for entry in json.loads(result.stdout or '[]'):
+            found.setdefault(entry['snapshot'], []).extend(entry['matches'])
+    return found
@@ -0,0 +1,34 @@
+#!/bin/bash
+set -euo pipefail
+
+REGION="${AWS_DEFAULT_REGION:-eu-west-2}"
+BUCKET=$(aws ssm get-parameter --name "/devbox/restic/bucket" --region "${REGION}" --query 'Parameter.Value' --output text)
+REPO="s3:s3.${REGION}.amazonaws.com/${BUCKET}/restic/data"
+
+# Get restic password from SSM
+export RESTIC_PASSWORD=$(aws ssm get-parameter --name "/devbox/restic/password" --with-decryption --region "${REGION}" --query 'Parameter.Value' --output text)
+export RESTIC_REPOSITORY="${REPO}"
+
+if ! restic snapshots &>/dev/null; then
+    echo "No data backup repository found, nothing to prune"
+    exit 0
+fi
+
+# Restores replay every incremental taken after the latest full snapshot
+# (restore-data, restore-lazy), so only incrementals older than it can go.
+# Times are compared to the second, as in restore-data.
+LATEST_TIME=$(restic snapshots --tag data --json | jq -r 'sort_by(.time) | last | .time // "" | .[0:19]')
+if [ -z "${LATEST_TIME}" ]; then
+    echo "No full snapshot yet, keeping all incremental snapshots"
+else
+    echo "Forgetting incremental snapshots older than the latest full snapshot (${LATEST_TIME})..."
+    restic snapshots --tag data-incr --json | \
+        jq -r --arg latest "$LATEST_TIME" '.[] | select(.time[0:19] < $latest) | .id' | \
+        xargs -r -n 500 restic forget
+fi
+
+echo "Forgetting old full snapshots and pruning..."
+restic forget --tag data --keep-last 10 --keep-daily 7 --keep-weekly 4 --prune
+
+echo "Data prune complete"
+restic snapshots --tag data
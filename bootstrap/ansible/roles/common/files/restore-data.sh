@@ -35,4 +35,15 @@ fi
 echo "Restoring data files from latest snapshot..."
 restic restore latest --tag data --target / --verbose
 
+# Replay incremental snapshots (backup-watch) taken after the full snapshot,
+# oldest first. Times are compared to the second; instances run in UTC.
+LATEST_TIME=$(restic snapshots --tag data --json | jq -r 'sort_by(.time) | last | .time[0:19]')
+INCREMENTALS=$(restic snapshots --tag data-incr --json 2>/dev/null | \
+    jq -r --arg since "$LATEST_TIME" '[.[] | select(.time[0:19] > $since)] | sort_by(.time) | .[].short_id')
+
+for snapshot in $INCREMENTALS; do
+    echo "Restoring incremental snapshot ${snapshot}..."
+    restic restore "${snapshot}" --target / --verbose
+done
+
 echo "Data restore complete"
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Restore ~/data in two phases so the box is usable before the restore ends.
+
+  hot         Restore the hot set straight into place during boot: every
+              path listed in the restore-hot manifest and the most recently
+              modified files up to a byte budget, each from the newest
+              snapshot (full or incremental) that holds it. At most a few
+              incremental snapshots are restored at boot; hot files whose
+              newest version is in another one are left to the background.
+              Then mark the box ready and write a plan for the rest.
+  background  Restore the rest with parallel restic workers. Each worker
+              restores a group of top-level ~/data entries from the full
+              snapshot and the incrementals that changed them into a
+              staging directory, which is then moved into place. Anything
+              that already exists in ~/data (the hot set, or files the user
+              created in the meantime) is never overwritten.
+  wait        Block until the given paths have been restored.
+  status      Show restore progress.
+
+Progress is kept in /var/lib/devbox-restore/status.json, which the backup
+tools read so that a partly restored ~/data is never backed up as a full
+snapshot. It is on the root volume so it survives a reboot, after which
+restore-data-background picks up the remaining groups. A failed hot phase
+is retried by the background command.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import devbox_restic
+
+DEFAULT_DATA_DIR = '/home/debian/data'
+DEFAULT_MANIFEST = '/home/debian/.config/devbox/restore-hot'
+DEFAULT_STATUS_FILE = '/var/lib/devbox-restore/status.json'
+
+# Must be on the same filesystem as ~/data so staged files can be renamed
+DEFAULT_STAGING_DIR = '/home/.devbox-restore'
+
+DEFAULT_HOT_DAYS = 7
+DEFAULT_HOT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_JOBS = 4
+
+# Each restic restore loads the index from S3, so boot time must not grow
+# with the number of incremental snapshots
+DEFAULT_BOOT_INCREMENTALS = 4
+
+# Keeps restic command lines well below ARG_MAX
+PATTERNS_PER_RESTORE = 500
+
+
+class Status:
+    """Restore progress, shared between worker threads and written atomically."""
+
+    def __init__(self, path, data=None):
+        self.path = path
+        self.data = data or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """Read a status file. Returns None if there is none."""
+        try:
+            with open(path) as f:
+                return cls(path, json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def update(self, **fields):
+        with self._lock:
+            self.data.update(fields)
+            self.data['updated'] = datetime.now(timezone.utc).isoformat()
+            self._write()
+
+    def update_group(self, index, restored=0, **fields):
+        """Update one background group, adding `restored` to the byte count."""
+        with self._lock:
+            self.data['groups'][index].update(fields)
+            self.data['restored_bytes'] = self.data.get('restored_bytes', 0) + restored
+            self.data['updated'] = datetime.now(timezone.utc).isoformat()
+            self._write()
+
+    def _write(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, mode=0o755, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.status-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, self.path)
+
+
+def escape_pattern(path):
+    """Escape a literal path for use as a restic include/exclude pattern."""
+    return re.sub(r'([*?\[\\])', r'\\\1', path)
+
+
+def is_under(path, prefix):
+    return path == prefix or path.startswith(prefix.rstrip('/') + '/')
+
+
+def read_manifest(path, data_dir):
+    """
+    Read the restore-hot manifest: one path or glob per line, relative to
+    ~/data unless absolute. Blank lines and # comments are ignored.
+    """
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+    patterns = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        patterns.append(os.path.normpath(os.path.join(data_dir, line)))
+    return patterns
+
+
+def matches_manifest(path, patterns):
+    """True if path matches a manifest pattern or is inside a matching directory."""
+    return any(fnmatch.fnmatchcase(path, p) or is_under(path, p) for p in patterns)
+
+
+def snapshot_nodes(env, snapshot_id, data_dir):
+    """List every node below data_dir in a snapshot as {path: node}."""
+    return {
+        node['path']: node
+        for node in devbox_restic.list_nodes(env, snapshot_id)
+        if is_under(node['path'], data_dir) and node['path'] != data_dir
+    }
+
+
+def top_entry(path, data_dir):
+    """Return the top-level ~/data entry that path is in."""
+    return os.path.join(data_dir, os.path.relpath(path, data_dir).split('/', 1)[0])
+
+
+def coalesce(env, full, incrementals, data_dir):
+    """
+    Merge a restore chain into one view of data_dir: {path: node} for the
+    newest version of each path, and {path: snapshot id} for where it is.
+    The incrementals are listed with a single restic find.
+    """
+    nodes = snapshot_nodes(env, full['id'], data_dir)
+    sources = dict.fromkeys(nodes, full['id'])
+
+    found = devbox_restic.find_nodes(env, [s['id'] for s in incrementals]) if incrementals else {}
+    for snapshot in incrementals:
+        for node in found.get(snapshot['id'], []):
+            path = node['path']
+            if not is_under(path, data_dir) or path == data_dir:
+                continue
+            # Directories in an incremental are only the parents of what
+            # changed; the full snapshot's copy stands unless it is new
+            if node.get('type') == 'dir' and path in nodes:
+                continue
+            nodes[path] = node
+            sources[path] = snapshot['id']
+
+    return nodes, sources
+
+
+def select_hot(files, manifest, hot_days, hot_max_bytes):
+    """
+    Pick the hot set. Manifest matches are always included; recently
+    modified files fill the remaining byte budget, newest first.
+    """
+    hot = {p for p in files if matches_manifest(p, manifest)}
+    used = sum(files[p].get('size', 0) for p in hot)
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=hot_days)
+    recent = []
+    for path, node in files.items():
+        if path in hot or 'mtime' not in node:
+            continue
+        mtime = devbox_restic.parse_time(node['mtime'])
+        if mtime >= cutoff:
+            recent.append((mtime, path))
+
+    for _, path in sorted(recent, reverse=True):
+        size = files[path].get('size', 0)
+        if used + size > hot_max_bytes:
+            break
+        hot.add(path)
+        used += size
+
+    return hot, used
+
+
+def plan_groups(nodes, hot, data_dir, jobs):
+    """
+    Split the snapshot by top-level ~/data entry and spread those entries
+    over `jobs` groups of roughly equal size (largest first onto the least
+    loaded group). Every entry gets a group, even one whose files are all
+    hot, so directories, symlinks and other non-file nodes are restored
+    too; only files outside the hot set count towards the size.
+    """
+    units = {}
+    for path, node in nodes.items():
+        unit = top_entry(path, data_dir)
+        size = node.get('size', 0) if node.get('type') == 'file' and path not in hot else 0
+        units[unit] = units.get(unit, 0) + size
+
+    groups = [{'paths': [], 'bytes': 0, 'state': 'pending'} for _ in range(jobs)]
+    for unit, size in sorted(units.items(), key=lambda item: item[1], reverse=True):
+        group = min(groups, key=lambda g: g['bytes'])
+        group['paths'].append(unit)
+        group['bytes'] += size
+
+    return [g for g in groups if g['paths']]
+
+
+def restore_snapshot(env, snapshot_id, target, includes=None):
+    """
+    Restore a snapshot into target, limited to the include patterns if
+    given. Returns True if every restic run succeeded.
+    """
+    batches = [None]
+    if includes is not None:
+        batches = [includes[i:i + PATTERNS_PER_RESTORE] for i in range(0, len(includes), PATTERNS_PER_RESTORE)]
+
+    for batch in batches:
+        args = ['restore', snapshot_id, '--target', target]
+        for pattern in batch or []:
+            args += ['--include', pattern]
+        result = devbox_restic.run_restic(args, env, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(result.stderr, file=sys.stderr, end='', flush=True)
+            return False
+    return True
+
+
+def merge_tree(staging, target='/'):
+    """
+    Move restored files from staging into place. Directories missing at the
+    destination are moved whole; existing files are left alone.
+    """
+    for dirpath, dirnames, filenames in os.walk(staging):
+        rel = os.path.relpath(dirpath, staging)
+        dest_dir = os.path.normpath(os.path.join(target, rel))
+
+        for name in list(dirnames):
+            src = os.path.join(dirpath, name)
+            dest = os.path.join(dest_dir, name)
+            if not os.path.lexists(dest):
+                os.rename(src, dest)
+                dirnames.remove(name)
+            elif os.path.islink(src) or not os.path.isdir(dest):
+                dirnames.remove(name)
+
+        for name in filenames:
+            dest = os.path.join(dest_dir, name)
+            if not os.path.lexists(dest):
+                os.rename(os.path.join(dirpath, name), dest)
+
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+def restore_hot(args):
+    env = devbox_restic.restic_env('data')
+    if env is None:
+        print("No restic bucket or password configured in SSM, skipping data restore")
+        return 0
+
+    # Options are kept so the background command can retry this phase
+    options = {key: getattr(args, key) for key in ('data_dir', 'manifest', 'hot_days', 'hot_max_bytes', 'boot_incrementals', 'jobs')}
+    status = Status(args.status_file, {'phase': 'hot', 'ready': False, 'data_dir': args.data_dir, 'options': options})
+    status.update(started=datetime.now(timezone.utc).isoformat())
+
+    try:
+        return _restore_hot(args, env, status)
+    except Exception:
+        status.update(phase='failed')
+        raise
+
+
+def _restore_hot(args, env, status):
+    chain = devbox_restic.restore_chain(env)
+    if not chain:
+        print("No data snapshots found, skipping restore")
+        status.update(phase='done', ready=True, groups=[])
+        return 0
+
+    full, incrementals = chain[0], chain[1:]
+    order = [full['id']] + [snapshot['id'] for snapshot in incrementals]
+    nodes, sources = coalesce(env, full, incrementals, args.data_dir)
+    files = {path: node for path, node in nodes.items() if node.get('type') == 'file'}
+    manifest = read_manifest(args.manifest, args.data_dir)
+    hot, _ = select_hot(files, manifest, args.hot_days, args.hot_max_bytes)
+    total_bytes = sum(node.get('size', 0) for node in files.values())
+
+    # Restore at most boot_incrementals incrementals (the newest ones that
+    # hold hot files); the rest of the hot set waits for the background
+    hot_incrementals = [i for i in order[1:] if i in {sources[p] for p in hot}]
+    boot = {full['id']}
+    if args.boot_incrementals > 0:
+        boot.update(hot_incrementals[-args.boot_incrementals:])
+    hot = {p for p in hot if sources[p] in boot}
+    hot_bytes = sum(files[p].get('size', 0) for p in hot)
+
+    print(f"Restoring hot set: {len(hot)} of {len(files)} files "
+          f"({hot_bytes / 1024 ** 2:.0f} of {total_bytes / 1024 ** 2:.0f} MiB) "
+          f"from {len(boot)} of {len(order)} snapshot(s)...", flush=True)
+    started = time.monotonic()
+    ok = True
+    for snapshot_id in order:
+        paths = [p for p in hot if sources[p] == snapshot_id]
+        if paths:
+            ok = ok and restore_snapshot(env, snapshot_id, '/', sorted(escape_pattern(p) for p in paths))
+    if not ok:
+        print("Hot set restore failed", file=sys.stderr)
+        status.update(phase='failed')
+        return 1
+
+    # Each group restores its entries from every snapshot that holds part
+    # of them outside the hot set, oldest first so newer versions win
+    touched = {}
+    for path, snapshot_id in sources.items():
+        if path not in hot:
+            touched.setdefault(top_entry(path, args.data_dir), set()).add(snapshot_id)
+    groups = plan_groups(nodes, hot, args.data_dir, args.jobs)
+    for group in groups:
+        ids = set().union(*(touched.get(unit, set()) for unit in group['paths']))
+        group['snapshots'] = [i for i in order if i in ids]
+
+    status.update(
+        phase='background' if groups else 'done',
+        ready=True,
+        hot=sorted(hot),
+        hot_bytes=hot_bytes,
+        total_bytes=total_bytes,
+        restored_bytes=hot_bytes,
+        groups=groups,
+    )
+    print(f"Hot set restored ({time.monotonic() - started:.1f}s); "
+          f"{len(groups)} group(s) left for the background restore")
+    return 0
+
+
+def restore_group(env, status, index, staging_dir):
+    group = status.data['groups'][index]
+    staging = os.path.join(staging_dir, f"group-{index}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    status.update_group(index, state='running')
+    started = time.monotonic()
+
+    # Hot files in these entries are restored again but not moved into
+    # place, as merge_tree never replaces existing files. restic 0.14 has
+    # no --exclude-file for restore, so excluding them could overflow
+    # ARG_MAX. Later snapshots overwrite earlier ones in staging.
+    includes = [escape_pattern(p) for p in group['paths']]
+    if not all(restore_snapshot(env, snapshot_id, staging, includes) for snapshot_id in group['snapshots']):
+        shutil.rmtree(staging, ignore_errors=True)
+        status.update_group(index, state='failed')
+        print(f"Group {index} failed: {', '.join(group['paths'])}", file=sys.stderr, flush=True)
+        return False
+
+    merge_tree(staging)
+    status.update_group(index, state='done', restored=group['bytes'])
+    print(f"Group {index} restored: {len(group['paths'])} path(s), "
+          f"{group['bytes'] / 1024 ** 2:.0f} MiB ({time.monotonic() - started:.1f}s)", flush=True)
+    return True
+
+
+def restore_background(args):
+    status = Status.load(args.status_file)
+    # A failed run can be retried; groups already done are skipped
+    if status is None or status.data.get('phase') not in ('hot', 'background', 'failed'):
+        print("No background restore pending")
+        return 0
+
+    # The hot phase failed or was interrupted before planning the groups
+    if 'groups' not in status.data:
+        print("Hot set restore did not finish, retrying it", flush=True)
+        hot_args = argparse.Namespace(status_file=args.status_file, **status.data['options'])
+        rc = restore_hot(hot_args)
+        status = Status.load(args.status_file)
+        if rc != 0 or status.data.get('phase') != 'background':
+            return rc
+    status.update(phase='background')
+
+    env = devbox_restic.restic_env('data')
+    if env is None:
+        print("No restic bucket or password configured in SSM", file=sys.stderr)
+        status.update(phase='failed')
+        return 1
+
+    pending = [i for i, g in enumerate(status.data['groups']) if g['state'] != 'done']
+
+    print(f"Restoring {len(pending)} group(s) with {args.jobs} worker(s)...", flush=True)
+    started = time.monotonic()
+    os.makedirs(args.staging_dir, mode=0o700, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        results = list(pool.map(
+            lambda i: restore_group(env, status, i, args.staging_dir), pending))
+    shutil.rmtree(args.staging_dir, ignore_errors=True)
+
+    ok = all(results)
+    status.update(phase='done' if ok else 'failed')
+    print(f"Background restore {'complete' if ok else 'failed'} ({time.monotonic() - started:.1f}s)")
+    return 0 if ok else 1
+
+
+def is_restored(status, path):
+    """True if path has been restored (or will never be by this restore)."""
+    data = status.data
+    if data.get('phase') == 'done':
+        return True
+    if not is_under(path, data.get('data_dir', DEFAULT_DATA_DIR)):
+        return True
+    if path in data.get('hot', []):
+        return True
+    # Wait for groups holding the path and, for a directory such as ~/data
+    # itself, for every group below it
+    for group in data.get('groups', []):
+        if group['state'] != 'done' and any(is_under(path, unit) or is_under(unit, path) for unit in group['paths']):
+            return False
+    return data.get('ready', False)
+
+
+def wait_for_paths(args):
+    paths = [os.path.abspath(p) for p in args.paths]
+    deadline = time.monotonic() + args.timeout if args.timeout else None
+
+    while True:
+        status = Status.load(args.status_file)
+        if status is None:
+            return 0
+        if status.data.get('phase') == 'failed':
+            print("Data restore failed", file=sys.stderr)
+            return 1
+
+        waiting = [p for p in paths if not is_restored(status, p)]
+        if not waiting:
+            return 0
+        if deadline and time.monotonic() >= deadline:
+            print(f"Timed out waiting for: {', '.join(waiting)}", file=sys.stderr)
+            return 1
+        time.sleep(1)
+
+
+def show_status(args):
+    status = Status.load(args.status_file)
+    if status is None:
+        print("No lazy restore has run on this instance")
+        return 0
+
+    if args.json:
+        print(json.dumps(status.data, indent=2))
+        return 0
+
+    data = status.data
+    total = data.get('total_bytes', 0)
+    restored = data.get('restored_bytes', 0)
+    percent = 100 * restored / total if total else 100
+    print(f"Phase:    {data.get('phase')}")
+    print(f"Restored: {restored / 1024 ** 2:.0f} of {total / 1024 ** 2:.0f} MiB ({percent:.0f}%)")
+    print(f"Hot set:  {len(data.get('hot', []))} files")
+    for index, group in enumerate(data.get('groups', [])):
+        print(f"  group {index}: {group['state']:8} {group['bytes'] / 1024 ** 2:8.0f} MiB  "
+              f"{', '.join(os.path.basename(p) for p in group['paths'])}")
+    return 0
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description='Restore ~/data hot set first, then the rest in the background.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s hot                           # Boot: restore recent and pinned files
+  %(prog)s background --jobs 8           # Restore the rest with 8 restic workers
+  %(prog)s wait ~/data/project           # Block until a path is restored
+  %(prog)s status
+        '''
+    )
+
+    parser.add_argument('--status-file', default=DEFAULT_STATUS_FILE,
+                        help=f'Progress file (default: {DEFAULT_STATUS_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    hot = subparsers.add_parser('hot', help='Restore the hot set and plan the rest')
+    hot.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                     help=f'Directory being restored (default: {DEFAULT_DATA_DIR})')
+    hot.add_argument('--manifest', default=DEFAULT_MANIFEST,
+                     help=f'Paths to always restore first (default: {DEFAULT_MANIFEST})')
+    hot.add_argument('--hot-days', type=float, default=DEFAULT_HOT_DAYS,
+                     help=f'Files modified within this many days are hot (default: {DEFAULT_HOT_DAYS})')
+    hot.add_argument('--hot-max-bytes', type=int, default=DEFAULT_HOT_MAX_BYTES,
+                     help=f'Byte budget for recent files (default: {DEFAULT_HOT_MAX_BYTES})')
+    hot.add_argument('--boot-incrementals', type=int, default=DEFAULT_BOOT_INCREMENTALS,
+                     help=f'Most incremental snapshots to restore from during boot '
+                          f'(default: {DEFAULT_BOOT_INCREMENTALS})')
+    hot.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                     help=f'Number of groups to plan for the background restore (default: {DEFAULT_JOBS})')
+    hot.set_defaults(func=restore_hot)
+
+    background = subparsers.add_parser('background', help='Restore everything outside the hot set')
+    background.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                            help=f'Parallel restic workers (default: {DEFAULT_JOBS})')
+    background.add_argument('--staging-dir', default=DEFAULT_STAGING_DIR,
+                            help=f'Staging directory on the ~/data filesystem (default: {DEFAULT_STAGING_DIR})')
+    background.set_defaults(func=restore_background)
+
+    wait = subparsers.add_parser('wait', help='Wait until paths have been restored')
+    wait.add_argument('paths', nargs='+', help='Files or directories to wait for')
+    wait.add_argument('--timeout', type=float, default=None, help='Give up after this many seconds')
+    wait.set_defaults(func=wait_for_paths)
+
+    status = subparsers.add_parser('status', help='Show restore progress')
+    status.add_argument('--json', action='store_true', help='Print the raw status')
+    status.set_defaults(func=show_status)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    sys.exit(args.func(args))
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+React to spot interruption notices with a deadline-bounded backup.
+
+Polls the instance metadata service (IMDSv2) for spot/instance-action and
+the rebalance recommendation. On a notice it backs up ~/data files changed
+since the last full snapshot, most recently modified first, in growing
+batches. The scan for changed files may use at most half of the budget.
+Each batch is its own data-incr snapshot, so anything that finishes before
+the deadline is safe even if the instance disappears mid-way. There is no
+prune. Throughput is measured as batches complete, and no batch is started
+unless it is expected to fit in the remaining time.
+
+A JSON report listing which files made it is uploaded to S3 next to the
+restic repository (reports/spot-interrupt/). Use --imds-endpoint to point
+at a local stand-in such as scripts/fake_imds.py.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+import devbox_restic
+
+DEFAULT_IMDS_ENDPOINT = 'http://169.254.169.254'
+DEFAULT_DATA_DIR = os.path.expanduser('~/data')
+DEFAULT_REPORT_DIR = os.path.expanduser('~/.cache/devbox')
+
+# Time reserved at the end of the budget for uploading the report and for
+# the instance to actually shut down
+DEFAULT_SAFETY_MARGIN_S = 15
+
+# Budget for a rebalance recommendation, which has no hard deadline. Kept
+# within the 2-minute interruption notice so that a batch started before a
+# termination notice cannot outlast it.
+DEFAULT_REBALANCE_BUDGET_S = 120
+
+# If no snapshot time is available, back up files changed in this window
+FALLBACK_WINDOW_S = 24 * 3600
+
+# Share of the remaining budget the scan for changed files may use; what
+# it has found by then is backed up with the rest of the time
+SCAN_BUDGET_SHARE = 0.5
+
+# First batch is small so throughput is measured early; later batches double
+FIRST_BATCH_BYTES = 8 * 1024 * 1024
+FIRST_BATCH_FILES = 64
+
+# Assumed before the first batch completes, and the fixed cost per snapshot
+INITIAL_THROUGHPUT_BPS = 20 * 1024 * 1024
+SNAPSHOT_OVERHEAD_S = 3
+
+
+class Imds:
+    """Minimal IMDSv2 client."""
+
+    def __init__(self, endpoint, timeout=2):
+        self.endpoint = endpoint.rstrip('/')
+        self.timeout = timeout
+        self._token = None
+        self._token_expires = 0
+
+    def _get_token(self):
+        if self._token and time.monotonic() < self._token_expires:
+            return self._token
+
+        request = urllib.request.Request(
+            f"{self.endpoint}/latest/api/token",
+            method='PUT',
+            headers={'X-aws-ec2-metadata-token-ttl-seconds': '21600'},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            self._token = response.read().decode('utf-8')
+        # Refresh well before the 6 hour TTL
+        self._token_expires = time.monotonic() + 3600
+        return self._token
+
+    def get(self, path):
+        """Return the body for a metadata path, or None if it does not exist (404)."""
+        request = urllib.request.Request(
+            f"{self.endpoint}/latest/meta-data/{path}",
+            headers={'X-aws-ec2-metadata-token': self._get_token()},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            if e.code == 401:
+                self._token = None
+            raise
+
+    def get_json(self, path):
+        body = self.get(path)
+        return json.loads(body) if body else None
+
+
+def parse_time(value):
+    """Parse an IMDS timestamp such as 2025-01-01T10:00:00Z."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def last_snapshot_time(env, timeout=15):
+    """
+    Epoch time of the newest full data snapshot, or None. Incremental
+    snapshots only hold some of the changed files, so they cannot serve as
+    the watermark. Bounded by a timeout since it spends the interruption
+    budget.
+    """
+    try:
+        result = devbox_restic.run_restic(
+            ['snapshots', '--tag', devbox_restic.DATA_TAG, '--json'],
+            env, capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0:
+        return None
+
+    snapshots = json.loads(result.stdout or '[]')
+    if not snapshots:
+        return None
+    return max(devbox_restic.snapshot_time(s) for s in snapshots).timestamp()
+
+
+def changed_files(data_dir, since, scan_deadline=None):
+    """
+    Files under data_dir modified after `since` (epoch), newest first.
+    The scan stops early once scan_deadline (monotonic time) has passed.
+    Returns a list of (path, size, mtime) and whether the scan completed.
+    """
+    files = []
+    for dirpath, _, filenames in os.walk(data_dir):
+        if scan_deadline is not None and time.monotonic() > scan_deadline:
+            files.sort(key=lambda f: f[2], reverse=True)
+            return files, False
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            # mtime only: restored files keep their original mtime but get
+            # a fresh ctime, which would make the whole tree look changed
+            if st.st_mtime > since:
+                files.append((path, st.st_size, st.st_mtime))
+
+    files.sort(key=lambda f: f[2], reverse=True)
+    return files, True
+
+
+def next_batch(files, start, max_bytes, max_files):
+    """Take files from `start` up to the byte and file limits (at least one file)."""
+    end = start
+    total = 0
+    while end < len(files) and (end == start or (total + files[end][1] <= max_bytes and end - start < max_files)):
+        total += files[end][1]
+        end += 1
+    return end, total
+
+
+def deadline_backup(files, deadline, env, dry_run=False, check_deadline=None):
+    """
+    Back up files in priority order in growing batches until they are all
+    saved or the next batch is not expected to finish before the deadline
+    (monotonic time). check_deadline, if given, is called before each batch
+    and may bring the deadline forward. Returns a list of batch result dicts.
+    """
+    batches = []
+    throughput = INITIAL_THROUGHPUT_BPS
+    max_bytes = FIRST_BATCH_BYTES
+    max_files = FIRST_BATCH_FILES
+    start = 0
+
+    while start < len(files):
+        if check_deadline:
+            deadline = min(deadline, check_deadline())
+        remaining = deadline - time.monotonic()
+        end, size = next_batch(files, start, max_bytes, max_files)
+        estimate = SNAPSHOT_OVERHEAD_S + size / throughput
+
+        # Shrink the batch until it fits, down to a single file
+        while end - start > 1 and estimate > remaining:
+            end = start + (end - start) // 2
+            size = sum(f[1] for f in files[start:end])
+            estimate = SNAPSHOT_OVERHEAD_S + size / throughput
+
+        if estimate > remaining:
+            print(f"Stopping: next batch needs ~{estimate:.0f}s, {remaining:.0f}s left", flush=True)
+            break
+
+        paths = [f[0] for f in files[start:end]]
+        print(f"Batch {len(batches) + 1}: {len(paths)} file(s), {size / 1024 / 1024:.1f} MiB, "
+              f"~{estimate:.0f}s of {remaining:.0f}s left", flush=True)
+
+        started = time.monotonic()
+        if dry_run:
+            rc = 0
+        else:
+            rc = devbox_restic.backup_paths(paths, devbox_restic.DATA_INCR_TAG, env, timeout=max(remaining, 1))
+        elapsed = time.monotonic() - started
+
+        saved = rc in (0, 3)
+        batches.append({
+            'files': paths,
+            'bytes': size,
+            'seconds': round(elapsed, 2),
+            'rc': rc,
+            'saved': saved,
+        })
+
+        if not saved:
+            # Timed out or failed; the rest will not do better
+            print(f"Batch failed (rc={rc}), stopping", file=sys.stderr, flush=True)
+            break
+
+        # Update the throughput estimate from what we just observed
+        if elapsed > SNAPSHOT_OVERHEAD_S and size > 0:
+            throughput = size / (elapsed - SNAPSHOT_OVERHEAD_S)
+
+        start = end
+        max_bytes *= 2
+        max_files *= 2
+
+    return batches
+
+
+def upload_report(report, report_dir, bucket):
+    """Write the report locally and, if a bucket is known, copy it to S3."""
+    os.makedirs(report_dir, exist_ok=True)
+    started = parse_time(report['started']).strftime('%Y%m%dT%H%M%SZ')
+    name = f"{report['instance_id'] or 'unknown'}-{started}.json"
+    path = os.path.join(report_dir, f"spot-interrupt-{name}")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {path}", flush=True)
+
+    if bucket:
+        dest = f"s3://{bucket}/reports/spot-interrupt/{name}"
+        result = subprocess.run(['aws', 's3', 'cp', path, dest, '--region', devbox_restic.REGION, '--only-show-errors'])
+        if result.returncode == 0:
+            print(f"Report uploaded to {dest}", flush=True)
+
+
+def handle_notice(kind, notice, budget, args, imds):
+    """Run the deadline-bounded backup for a notice and report the result."""
+    started_wall = datetime.now(timezone.utc)
+    deadline = time.monotonic() + budget - args.safety_margin
+    print(f"{kind} notice: {json.dumps(notice)}; budget {budget:.0f}s "
+          f"({budget - args.safety_margin:.0f}s after safety margin)", flush=True)
+
+    env = None if args.dry_run else devbox_restic.restic_env('data')
+    bucket = None if args.dry_run else devbox_restic.get_ssm_parameter('/devbox/restic/bucket')
+    if env is None and not args.dry_run:
+        print("No restic bucket or password configured in SSM, cannot back up", file=sys.stderr, flush=True)
+
+    since = None if env is None else last_snapshot_time(env)
+    if since is None:
+        since = time.time() - FALLBACK_WINDOW_S
+    scan_deadline = time.monotonic() + max(deadline - time.monotonic(), 0) * SCAN_BUDGET_SHARE
+    files, scan_complete = changed_files(args.data_dir, since, scan_deadline)
+    print(f"{len(files)} file(s) changed since {datetime.fromtimestamp(since, timezone.utc).isoformat()}"
+          f"{'' if scan_complete else ' (scan cut short by the deadline)'}", flush=True)
+
+    # A rebalance backup keeps watching for the real interruption notice and
+    # cuts its deadline to the interruption time if one arrives
+    instance_action = {}
+
+    def check_instance_action():
+        try:
+            action = instance_action or imds.get_json('spot/instance-action')
+        except (urllib.error.URLError, OSError, json.JSONDecodeError):
+            return deadline
+        if not action:
+            return deadline
+        if not instance_action:
+            instance_action.update(action)
+            print(f"instance-action notice during {kind} backup: {json.dumps(action)}", flush=True)
+        left = (parse_time(action['time']) - datetime.now(timezone.utc)).total_seconds()
+        return time.monotonic() + left - args.safety_margin
+
+    batches = []
+    if files and (env is not None or args.dry_run):
+        check = check_instance_action if kind == 'rebalance' else None
+        batches = deadline_backup(files, deadline, env, args.dry_run, check)
+
+    saved = [p for b in batches if b['saved'] for p in b['files']]
+    saved_set = set(saved)
+    missed = [f[0] for f in files if f[0] not in saved_set]
+
+    try:
+        instance_id = imds.get('instance-id')
+    except (urllib.error.URLError, OSError):
+        instance_id = None
+
+    report = {
+        'kind': kind,
+        'notice': notice,
+        'instance_id': instance_id,
+        'started': started_wall.isoformat(),
+        'finished': datetime.now(timezone.utc).isoformat(),
+        'budget_seconds': round(budget, 1),
+        'changed_since': datetime.fromtimestamp(since, timezone.utc).isoformat(),
+        'scan_complete': scan_complete,
+        'dry_run': args.dry_run,
+        'instance_action': instance_action or None,
+        'batches': [{k: v for k, v in b.items() if k != 'files'} | {'file_count': len(b['files'])} for b in batches],
+        'saved': saved,
+        'missed': missed,
+    }
+
+    print(f"Saved {len(saved)} of {len(files)} changed file(s); {len(missed)} missed", flush=True)
+    upload_report(report, args.report_dir, bucket)
+    return report
+
+
+def poll(args):
+    """Poll IMDS until an instance-action notice has been handled."""
+    imds = Imds(args.imds_endpoint)
+    handled_rebalance = None
+
+    print(f"Polling {args.imds_endpoint} every {args.interval}s for spot notices", flush=True)
+
+    while True:
+        try:
+            action = imds.get_json('spot/instance-action')
+            rebalance = imds.get_json('events/recommendations/rebalance')
+        except (urllib.error.URLError, OSError, json.JSONDecodeError) as e:
+            print(f"Warning: IMDS poll failed: {e}", file=sys.stderr, flush=True)
+            time.sleep(args.interval)
+            continue
+
+        if action:
+            budget = (parse_time(action['time']) - datetime.now(timezone.utc)).total_seconds()
+            handle_notice('instance-action', action, max(budget, 0), args, imds)
+            return
+
+        if rebalance and rebalance.get('noticeTime') != handled_rebalance:
+            handled_rebalance = rebalance.get('noticeTime')
+            report = handle_notice('rebalance', rebalance, args.rebalance_budget, args, imds)
+            if report['instance_action']:
+                # Already backed up against the interruption deadline
+                return
+
+        time.sleep(args.interval)
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description='Back up ~/data against the deadline when a spot interruption notice arrives.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s                                              # Poll the real IMDS
+  %(prog)s --imds-endpoint http://127.0.0.1:8111 --dry-run   # Against scripts/fake_imds.py
+        '''
+    )
+
+    parser.add_argument('--imds-endpoint', default=os.environ.get('IMDS_ENDPOINT', DEFAULT_IMDS_ENDPOINT),
+                        help=f'Instance metadata endpoint (default: $IMDS_ENDPOINT or {DEFAULT_IMDS_ENDPOINT})')
+    parser.add_argument('--interval', type=float, default=5,
+                        help='Polling interval in seconds (default: 5)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help=f'Directory to back up (default: {DEFAULT_DATA_DIR})')
+    parser.add_argument('--safety-margin', type=float, default=DEFAULT_SAFETY_MARGIN_S,
+                        help=f'Seconds reserved before the deadline (default: {DEFAULT_SAFETY_MARGIN_S})')
+    parser.add_argument('--rebalance-budget', type=float, default=DEFAULT_REBALANCE_BUDGET_S,
+                        help=f'Seconds to spend on a rebalance recommendation (default: {DEFAULT_REBALANCE_BUDGET_S})')
+    parser.add_argument('--report-dir', default=DEFAULT_REPORT_DIR,
+                        help=f'Where to write the local report (default: {DEFAULT_REPORT_DIR})')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Plan batches and write the report without running restic or uploading')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+
+    try:
+        poll(args)
+    except KeyboardInterrupt:
+        pass
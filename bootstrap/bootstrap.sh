@@ -2,15 +2,41 @@
 set -euo pipefail
 
 SCRIPTS_DIR="/opt/bootstrap/scripts"
+TIMINGS_LOG="${BOOTSTRAP_TIMINGS_LOG:-/var/log/bootstrap-timings.log}"
+
+# Record a start/end marker for boot_profile.py (epoch, event, name, exit code)
+log_timing() {
+    printf '%s\t%s\t%s\t%s\n' "$(date +%s.%N)" "$1" "$2" "${3:-}" >> "$TIMINGS_LOG"
+}
 
 echo "=== Starting bootstrap ==="
+log_timing start bootstrap
 
-for script in "$SCRIPTS_DIR"/*.sh; do
-    if [ -x "$script" ]; then
-        echo ">>> Running: $(basename "$script")"
-        "$script"
-        echo "<<< Completed: $(basename "$script")"
+if [ "${BOOTSTRAP_SEQUENTIAL:-0}" = "1" ]; then
+    # Original one-at-a-time run of every numbered script
+    for script in "$SCRIPTS_DIR"/*.sh; do
+        if [ -x "$script" ]; then
+            echo ">>> Running: $(basename "$script")"
+            log_timing start "$(basename "$script")"
+            rc=0
+            "$script" || rc=$?
+            log_timing end "$(basename "$script")" "$rc"
+            if [ "$rc" -ne 0 ]; then
+                log_timing end bootstrap "$rc"
+                exit "$rc"
+            fi
+            echo "<<< Completed: $(basename "$script")"
+        fi
+    done
+else
+    # Run scripts and Ansible task files as a dependency DAG
+    rc=0
+    python3 "$SCRIPTS_DIR/boot_orchestrator.py" --timings-log "$TIMINGS_LOG" || rc=$?
+    if [ "$rc" -ne 0 ]; then
+        log_timing end bootstrap "$rc"
+        exit "$rc"
     fi
-done
+fi
 
+log_timing end bootstrap 0
 echo "=== Bootstrap complete ==="
@@ -1,6 +1,11 @@
 #!/bin/bash
 set -euo pipefail
 
+if [ -f /etc/devbox-image ]; then
+    echo "Tailscale is baked into the golden image, skipping install"
+    exit 0
+fi
+
 echo "Installing Tailscale..."
 
 # Install Tailscale using official script
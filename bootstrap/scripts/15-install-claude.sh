@@ -1,6 +1,11 @@
 #!/bin/bash
 set -euo pipefail
 
+if [ -f /etc/devbox-image ]; then
+    echo "Claude Code is baked into the golden image, skipping install"
+    exit 0
+fi
+
 echo "Installing Node.js and Claude Code..."
 
 # Install Node.js via NodeSource
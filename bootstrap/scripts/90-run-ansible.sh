@@ -2,11 +2,23 @@
 set -euo pipefail
 
 ANSIBLE_DIR="/opt/bootstrap/ansible"
+IMAGE_MARKER="/etc/devbox-image"
 
-echo "Running Ansible playbook..."
+# On the golden image only the per-instance tasks need to run
+DEVBOX_MODE="full"
+if [ -f "${IMAGE_MARKER}" ]; then
+    DEVBOX_MODE="instance"
+fi
+
+# Per-task timings for boot_profile.py (see ansible/callback_plugins/boot_timings.py)
+export ANSIBLE_CALLBACKS_ENABLED="boot_timings"
+export BOOT_TIMINGS_ANSIBLE_LOG="${BOOT_TIMINGS_ANSIBLE_LOG:-/var/log/bootstrap-ansible-timings.jsonl}"
+
+echo "Running Ansible playbook (mode: ${DEVBOX_MODE})..."
 
 ansible-playbook \
     -i "${ANSIBLE_DIR}/inventory.ini" \
+    -e "devbox_mode=${DEVBOX_MODE}" \
     "${ANSIBLE_DIR}/site.yml"
 
 echo "Ansible playbook completed"
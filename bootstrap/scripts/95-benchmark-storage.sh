@@ -0,0 +1,104 @@
+#!/bin/bash
+set -euo pipefail
+
+# Measure ephemeral /home throughput with fio and record it per instance
+# type in S3 (benchmarks/<instance-type>/<instance-id>.json), where
+# scripts/find_cheapest_spot.py --benchmarks reads it. Runs once per
+# instance type unless BENCHMARK_FORCE=1. Never fails the boot.
+
+REGION="${AWS_DEFAULT_REGION:-eu-west-2}"
+EPHEMERAL_LABEL="ephemeral-home"
+BENCH_DIR="/home/.devbox-benchmark"
+RESULT_FILE="/var/log/bootstrap/storage-benchmark.json"
+RESTORE_STATUS="/var/lib/devbox-restore/status.json"
+RUNTIME="${BENCHMARK_RUNTIME:-10}"
+SIZE="${BENCHMARK_SIZE:-1G}"
+
+trap 'rm -rf "${BENCH_DIR}"' EXIT
+trap 'echo "Storage benchmark failed, continuing boot"; exit 0' ERR
+
+if ! command -v fio >/dev/null 2>&1; then
+    echo "fio not installed, skipping storage benchmark"
+    exit 0
+fi
+
+if [ "$(findmnt -n -o LABEL /home || true)" != "${EPHEMERAL_LABEL}" ]; then
+    echo "/home is not on ephemeral storage, skipping storage benchmark"
+    exit 0
+fi
+
+# A restore writing to /home would skew the numbers, so only benchmark
+# before one starts or after it has finished
+RESTORE_PHASE=$(jq -r '.phase // empty' "${RESTORE_STATUS}" 2>/dev/null || true)
+if [ -n "${RESTORE_PHASE}" ] && [ "${RESTORE_PHASE}" != "done" ]; then
+    echo "Restore in progress (phase ${RESTORE_PHASE}), skipping storage benchmark"
+    exit 0
+fi
+
+IMDS_TOKEN=$(curl -sf -X PUT "http://169.254.169.254/latest/api/token" -H "X-aws-ec2-metadata-token-ttl-seconds: 300")
+imds() {
+    curl -sf -H "X-aws-ec2-metadata-token: ${IMDS_TOKEN}" "http://169.254.169.254/latest/meta-data/$1"
+}
+INSTANCE_TYPE=$(imds instance-type)
+INSTANCE_ID=$(imds instance-id)
+AZ=$(imds placement/availability-zone)
+
+BUCKET=$(aws ssm get-parameter --name "/devbox/restic/bucket" --region "${REGION}" --query 'Parameter.Value' --output text 2>/dev/null || echo "")
+PREFIX="s3://${BUCKET}/benchmarks/${INSTANCE_TYPE}"
+
+if [ -n "${BUCKET}" ] && [ "${BENCHMARK_FORCE:-0}" != "1" ] && \
+    [ -n "$(aws s3 ls "${PREFIX}/" --region "${REGION}" 2>/dev/null || true)" ]; then
+    echo "Storage benchmark for ${INSTANCE_TYPE} already recorded, skipping"
+    exit 0
+fi
+
+# One fio job per disk so a RAID0 array gets enough parallel I/O
+DISKS=$(lsblk -d -o NAME,MODEL -n | grep -c "Instance Storage" || true)
+JOBS=$(( DISKS > 0 ? DISKS : 1 ))
+
+mkdir -p "${BENCH_DIR}" "$(dirname "${RESULT_FILE}")"
+
+# run_fio <rw> <block size> <iodepth> <read|write> <bw_bytes|iops>
+run_fio() {
+    fio --name="$1" --directory="${BENCH_DIR}" --rw="$1" --bs="$2" --iodepth="$3" \
+        --numjobs="${JOBS}" --size="${SIZE}" --runtime="${RUNTIME}" --time_based \
+        --ioengine=libaio --direct=1 --group_reporting --output-format=json |
+        jq ".jobs[0].$4.$5"
+}
+
+echo "Benchmarking ephemeral storage on ${INSTANCE_TYPE} (${DISKS} disk(s), ${RUNTIME}s per test)..."
+SEQ_WRITE=$(run_fio write 1M 32 write bw_bytes)
+SEQ_READ=$(run_fio read 1M 32 read bw_bytes)
+RAND_WRITE=$(run_fio randwrite 4k 64 write iops)
+RAND_READ=$(run_fio randread 4k 64 read iops)
+
+jq -n \
+    --arg instance_type "${INSTANCE_TYPE}" \
+    --arg instance_id "${INSTANCE_ID}" \
+    --arg availability_zone "${AZ}" \
+    --arg timestamp "$(date -u +%Y-%m-%dT%H:%M:%SZ)" \
+    --arg fio_version "$(fio --version)" \
+    --argjson disks "${DISKS}" \
+    --argjson seq_read "${SEQ_READ}" \
+    --argjson seq_write "${SEQ_WRITE}" \
+    --argjson rand_read "${RAND_READ}" \
+    --argjson rand_write "${RAND_WRITE}" \
+    '{
+        instance_type: $instance_type,
+        instance_id: $instance_id,
+        availability_zone: $availability_zone,
+        timestamp: $timestamp,
+        fio_version: $fio_version,
+        disks: $disks,
+        seq_read_mbps: ($seq_read / 1000000 | floor),
+        seq_write_mbps: ($seq_write / 1000000 | floor),
+        rand_read_iops: ($rand_read | floor),
+        rand_write_iops: ($rand_write | floor)
+    }' > "${RESULT_FILE}"
+
+cat "${RESULT_FILE}"
+
+if [ -n "${BUCKET}" ]; then
+    aws s3 cp "${RESULT_FILE}" "${PREFIX}/${INSTANCE_ID}.json" --region "${REGION}" --only-show-errors
+    echo "Benchmark uploaded to ${PREFIX}/${INSTANCE_ID}.json"
+fi
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Run the devbox boot steps as a dependency DAG.
+
+Bootstrap scripts and the common role's task files are declared as steps
+with explicit dependencies. Independent steps run concurrently, bounded by
+--jobs. Steps sharing a lock (e.g. anything that takes the dpkg lock) never
+overlap but are otherwise unordered. A failed step blocks everything that
+depends on it; unrelated steps still run.
+
+Steps marked as baked are skipped when booting from the golden image
+(detected by its marker file), leaving only the per-instance steps.
+
+Each step's output goes to its own log file, and start/end markers are
+written in bootstrap.sh's timing format so boot_profile.py can show the
+parallel timeline.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+SCRIPTS_DIR = '/opt/bootstrap/scripts'
+ANSIBLE_DIR = '/opt/bootstrap/ansible'
+DEFAULT_LOG_DIR = '/var/log/bootstrap'
+DEFAULT_TIMINGS_LOG = '/var/log/bootstrap-timings.log'
+DEFAULT_ANSIBLE_TIMINGS_LOG = '/var/log/bootstrap-ansible-timings.jsonl'
+IMAGE_MARKER = '/etc/devbox-image'
+
+# Boot steps. Each runs either a bootstrap script or the common role task
+# file with the matching tag (see roles/common/tasks/main.yml).
+#   after: steps that must succeed first
+#   locks: named resources held exclusively while the step runs
+#   baked: already done in the golden image (image mode of the common role)
+STEPS = [
+    {'name': 'install-tailscale', 'script': '10-install-tailscale.sh', 'locks': ['apt'], 'baked': True},
+    {'name': 'install-claude', 'script': '15-install-claude.sh', 'locks': ['apt'], 'baked': True},
+    {'name': 'tailscale-auth', 'script': '20-tailscale-auth.sh', 'after': ['install-tailscale']},
+    {'name': 'ephemeral', 'tags': 'ephemeral'},
+    {'name': 'users', 'tags': 'users', 'after': ['ephemeral']},
+    {'name': 'ssh-host-keys', 'tags': 'ssh-host-keys'},
+    # Benchmarks /home before restore writes to it; skipped once the
+    # instance type has a recorded result
+    {'name': 'benchmark-storage', 'script': '95-benchmark-storage.sh', 'after': ['ephemeral']},
+    {'name': 'restore', 'tags': 'restore', 'after': ['users', 'benchmark-storage']},
+    {'name': 'packages', 'tags': 'packages', 'locks': ['apt'], 'baked': True},
+    {'name': 'docker', 'tags': 'docker', 'after': ['users'], 'locks': ['apt'], 'baked': True},
+    {'name': 'backup-scripts', 'tags': 'backup-scripts', 'after': ['restore']},
+    {'name': 'backup-timer', 'tags': 'backup-timer', 'after': ['backup-scripts'], 'baked': True},
+    {'name': 'motd', 'tags': 'motd', 'baked': True},
+]
+
+# Numbered scripts that are deliberately not steps: the Ansible steps above
+# run the playbook that 90-run-ansible.sh runs in sequential mode
+REPLACED_SCRIPTS = {'90-run-ansible.sh'}
+
+_timings_lock = threading.Lock()
+
+
+def validate_steps(steps):
+    """
+    Check that step names are unique, dependencies exist and there are no
+    cycles. Returns a list of error strings (empty if the DAG is valid).
+    """
+    errors = []
+    names = [s['name'] for s in steps]
+    by_name = {s['name']: s for s in steps}
+
+    for name in set(names):
+        if names.count(name) > 1:
+            errors.append(f"Duplicate step: {name}")
+
+    for step in steps:
+        for dep in step.get('after', []):
+            if dep not in by_name:
+                errors.append(f"Step {step['name']} depends on unknown step {dep}")
+
+    # Kahn's algorithm: anything left over is part of a cycle
+    remaining = {s['name']: set(d for d in s.get('after', []) if d in by_name) for s in steps}
+    while True:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            break
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+    if remaining:
+        errors.append(f"Dependency cycle between: {', '.join(sorted(remaining))}")
+
+    return errors
+
+
+def find_unlisted_scripts(steps, scripts_dir):
+    """
+    Return executable *.sh files in scripts_dir that no step runs.
+    BOOTSTRAP_SEQUENTIAL=1 runs every such script, so one missing from
+    STEPS would silently be skipped in the default parallel mode.
+    """
+    listed = {s['script'] for s in steps if 'script' in s} | REPLACED_SCRIPTS
+    if not os.path.isdir(scripts_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(scripts_dir)
+        if name.endswith('.sh') and name not in listed
+        and os.access(os.path.join(scripts_dir, name), os.X_OK)
+    )
+
+
+def step_command(step, devbox_mode='full'):
+    """Build the command line for a step."""
+    if 'script' in step:
+        return [os.path.join(SCRIPTS_DIR, step['script'])]
+
+    return [
+        'ansible-playbook',
+        '-i', os.path.join(ANSIBLE_DIR, 'inventory.ini'),
+        os.path.join(ANSIBLE_DIR, 'site.yml'),
+        '--tags', step['tags'],
+        '-e', f"devbox_mode={devbox_mode}",
+    ]
+
+
+def log_timing(path, event, name, rc=''):
+    """Append a start/end marker in bootstrap.sh's timing format."""
+    with _timings_lock:
+        with open(path, 'a') as f:
+            f.write(f"{time.time():.6f}\t{event}\t{name}\t{rc}\n")
+
+
+def run_step(step, log_dir, timings_log, ansible_timings_log, devbox_mode):
+    """
+    Run one step, sending its output to <log_dir>/<name>.log.
+    Returns (exit code, duration in seconds).
+    """
+    env = dict(os.environ)
+    env['ANSIBLE_CALLBACKS_ENABLED'] = 'boot_timings'
+    env['BOOT_TIMINGS_ANSIBLE_LOG'] = ansible_timings_log
+    env['BOOT_TIMINGS_STEP'] = step['name']
+
+    log_path = os.path.join(log_dir, f"{step['name']}.log")
+    started = time.time()
+    log_timing(timings_log, 'start', step['name'])
+
+    with open(log_path, 'w') as log:
+        try:
+            rc = subprocess.run(step_command(step, devbox_mode), stdout=log, stderr=subprocess.STDOUT, env=env).returncode
+        except OSError as e:
+            log.write(f"Failed to start step: {e}\n")
+            rc = 127
+
+    log_timing(timings_log, 'end', step['name'], rc)
+    return rc, time.time() - started
+
+
+def run_dag(steps, jobs, log_dir, timings_log, ansible_timings_log, golden_image=False):
+    """
+    Run steps respecting dependencies, locks and the concurrency bound.
+    With golden_image set, baked steps are skipped and count as satisfied.
+    Returns a dict of step name -> result dict (status, rc, seconds).
+    """
+    by_name = {s['name']: s for s in steps}
+    results = {}
+    pending = [s['name'] for s in steps]
+    running = {}
+    held_locks = set()
+    devbox_mode = 'instance' if golden_image else 'full'
+
+    if golden_image:
+        for step in steps:
+            if step.get('baked'):
+                results[step['name']] = {'status': 'skipped', 'rc': None, 'seconds': 0, 'reason': 'in golden image'}
+                pending.remove(step['name'])
+
+    def failed_dependencies(step):
+        return [d for d in step.get('after', []) if results.get(d, {}).get('status') in ('failed', 'blocked')]
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            # Block steps whose dependencies failed, repeating until the
+            # failure has propagated down every chain
+            blocked_any = True
+            while blocked_any:
+                blocked_any = False
+                for name in list(pending):
+                    failed = failed_dependencies(by_name[name])
+                    if failed:
+                        results[name] = {'status': 'blocked', 'rc': None, 'seconds': 0,
+                                         'reason': f"dependency failed: {', '.join(failed)}"}
+                        pending.remove(name)
+                        blocked_any = True
+                        print(f"--- Blocked: {name} (dependency failed: {', '.join(failed)})", flush=True)
+
+            if not pending and not running:
+                break
+
+            # Start every ready step we have capacity and locks for
+            for name in list(pending):
+                if len(running) >= jobs:
+                    break
+                step = by_name[name]
+                deps_done = all(results.get(d, {}).get('status') in ('ok', 'skipped') for d in step.get('after', []))
+                locks = set(step.get('locks', []))
+                if not deps_done or locks & held_locks:
+                    continue
+
+                held_locks |= locks
+                pending.remove(name)
+                print(f">>> Starting: {name}", flush=True)
+                future = pool.submit(run_step, step, log_dir, timings_log, ansible_timings_log, devbox_mode)
+                running[future] = name
+
+            if not running:
+                # Nothing can make progress (should not happen with a valid DAG)
+                for name in pending:
+                    results[name] = {'status': 'blocked', 'rc': None, 'seconds': 0, 'reason': 'unschedulable'}
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                held_locks -= set(by_name[name].get('locks', []))
+                rc, seconds = future.result()
+                status = 'ok' if rc == 0 else 'failed'
+                results[name] = {'status': status, 'rc': rc, 'seconds': round(seconds, 1)}
+                marker = '<<< Completed' if rc == 0 else '!!! Failed'
+                print(f"{marker}: {name} ({seconds:.1f}s, rc={rc}, log: {os.path.join(log_dir, name + '.log')})", flush=True)
+
+    return results
+
+
+def print_results(steps, results):
+    """Print a per-step results table."""
+    print("\n" + "=" * 80)
+    print("BOOT STEPS")
+    print("=" * 80)
+    for step in steps:
+        result = results.get(step['name'], {'status': 'unknown', 'seconds': 0})
+        reason = f" ({result['reason']})" if result.get('reason') else ''
+        print(f"  {step['name']:<20} {result['status']:<8} {result['seconds']:>7.1f}s{reason}")
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description='Run devbox boot steps as a dependency DAG with bounded parallelism.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s                     # Run all steps, up to one per CPU (min 2)
+  %(prog)s --jobs 1            # Run one step at a time in dependency order
+  %(prog)s --list              # Show steps and dependencies
+        '''
+    )
+
+    parser.add_argument('-j', '--jobs', type=int, default=max(2, os.cpu_count() or 1),
+                        help='Maximum number of steps to run concurrently (default: CPU count, min 2)')
+    parser.add_argument('--log-dir', default=DEFAULT_LOG_DIR,
+                        help=f'Directory for per-step logs (default: {DEFAULT_LOG_DIR})')
+    parser.add_argument('--timings-log', default=DEFAULT_TIMINGS_LOG,
+                        help=f'Step timing log for boot_profile.py (default: {DEFAULT_TIMINGS_LOG})')
+    parser.add_argument('--ansible-timings-log', default=DEFAULT_ANSIBLE_TIMINGS_LOG,
+                        help=f'Ansible task timing log (default: {DEFAULT_ANSIBLE_TIMINGS_LOG})')
+    parser.add_argument('--image-marker', default=IMAGE_MARKER,
+                        help=f'Golden image marker; baked steps are skipped if present (default: {IMAGE_MARKER})')
+    parser.add_argument('--list', action='store_true',
+                        help='List steps and exit')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+
+    errors = validate_steps(STEPS)
+    errors += [
+        f"{name} in {SCRIPTS_DIR} has no step; add it to STEPS in boot_orchestrator.py"
+        for name in find_unlisted_scripts(STEPS, SCRIPTS_DIR)
+    ]
+    if errors:
+        for error in errors:
+            print(f"Error: {error}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.list:
+        for step in STEPS:
+            after = ', '.join(step.get('after', [])) or '-'
+            locks = ', '.join(step.get('locks', [])) or '-'
+            baked = ' (baked)' if step.get('baked') else ''
+            print(f"  {step['name']:<20} after: {after:<25} locks: {locks:<6}{baked}")
+        sys.exit(0)
+
+    if args.jobs < 1:
+        print("Error: --jobs must be at least 1", file=sys.stderr)
+        sys.exit(2)
+
+    os.makedirs(args.log_dir, exist_ok=True)
+
+    golden_image = os.path.exists(args.image_marker)
+    if golden_image:
+        print(f"Golden image detected ({args.image_marker}), skipping baked steps", flush=True)
+
+    results = run_dag(STEPS, args.jobs, args.log_dir, args.timings_log, args.ansible_timings_log, golden_image)
+    print_results(STEPS, results)
+
+    if any(r['status'] not in ('ok', 'skipped') for r in results.values()):
+        sys.exit(1)
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Profile the devbox boot pipeline.
+
+Combines three sources into a single timeline:
+  - cloud-init stage/module events from /var/log/cloud-init.log
+  - bootstrap script start/end markers written by bootstrap.sh
+  - Ansible per-task timings written by the boot_timings callback
+
+Writes a Chrome trace-event JSON file (open in Perfetto or chrome://tracing
+for a flame chart), a self-contained HTML timeline, and prints a
+critical-path summary showing which phase dominates boot.
+"""
+
+import argparse
+import html
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+DEFAULT_CLOUD_INIT_LOG = '/var/log/cloud-init.log'
+DEFAULT_BOOTSTRAP_LOG = '/var/log/bootstrap-timings.log'
+DEFAULT_ANSIBLE_LOG = '/var/log/bootstrap-ansible-timings.jsonl'
+
+# cloud-init event lines, e.g.
+# 2025-01-01 10:00:00,123 - handlers.py[DEBUG]: start: modules-final/config-scripts-user: running ...
+CLOUD_INIT_EVENT = re.compile(
+    r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) - \S+\[DEBUG\]: (start|finish): ([^:]+): (.*)$'
+)
+
+# Phase names used to group spans in the summary
+PHASE_ALIASES = {
+    'package-update-upgrade-install': 'packages',
+    'package_update_upgrade_install': 'packages',
+    'install-tailscale': 'tailscale',
+    'tailscale-auth': 'tailscale',
+    'install-claude': 'claude',
+    'run-ansible': 'ansible',
+}
+
+# Gaps shorter than this are not reported on the critical path
+GAP_TOLERANCE_S = 0.05
+
+
+def parse_cloud_init_log(path):
+    """
+    Parse start/finish event pairs from the cloud-init log.
+    Timestamps are logged in the instance's local time, which is UTC on EC2.
+    """
+    spans = []
+    open_events = {}
+
+    if not os.path.exists(path):
+        return spans
+
+    with open(path, errors='replace') as f:
+        for line in f:
+            match = CLOUD_INIT_EVENT.match(line.rstrip('\n'))
+            if not match:
+                continue
+
+            stamp, kind, name, detail = match.groups()
+            ts = datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S,%f').replace(tzinfo=timezone.utc).timestamp()
+
+            if kind == 'start':
+                open_events[name] = ts
+                continue
+
+            start = open_events.pop(name, None)
+            if start is None:
+                continue
+
+            module = name.split('/')[-1]
+            if module.startswith('config-'):
+                module = module[len('config-'):]
+
+            spans.append({
+                'name': name,
+                'source': 'cloud-init',
+                'phase': PHASE_ALIASES.get(module, module),
+                'start': start,
+                'end': ts,
+                'status': 'ok' if detail.startswith('SUCCESS') else 'failed',
+            })
+
+    return spans
+
+
+def parse_bootstrap_log(path):
+    """
+    Parse the tab-separated start/end markers written by bootstrap.sh.
+    Format: <epoch>\\t<start|end>\\t<name>\\t<exit code>
+    """
+    spans = []
+    open_events = {}
+
+    if not os.path.exists(path):
+        return spans
+
+    with open(path) as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 3:
+                continue
+
+            try:
+                ts = float(fields[0])
+            except ValueError:
+                continue
+            kind, name = fields[1], fields[2]
+            rc = fields[3] if len(fields) > 3 else ''
+
+            if kind == 'start':
+                open_events[name] = ts
+                continue
+
+            start = open_events.pop(name, None)
+            if start is None:
+                continue
+
+            # 10-install-tailscale.sh -> install-tailscale
+            stem = re.sub(r'^\d+-', '', os.path.splitext(name)[0])
+
+            spans.append({
+                'name': name,
+                'source': 'bootstrap',
+                'phase': PHASE_ALIASES.get(stem, stem),
+                'start': start,
+                'end': ts,
+                'status': 'ok' if rc in ('', '0') else f"failed (rc={rc})",
+            })
+
+    return spans
+
+
+def parse_ansible_log(path):
+    """
+    Parse per-task JSON lines written by the boot_timings callback.
+    Tasks are grouped into phases by the task file they come from.
+    """
+    spans = []
+
+    if not os.path.exists(path):
+        return spans
+
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            spans.append({
+                'name': f"{entry.get('file') or 'ansible'}: {entry['task']}",
+                'source': 'ansible',
+                'phase': entry.get('file') or 'ansible',
+                'start': entry['start'],
+                'end': entry['end'],
+                'status': entry.get('status', 'ok'),
+                'step': entry.get('step', ''),
+            })
+
+    return spans
+
+
+def is_parent(parent, child):
+    """
+    Decide whether child runs inside parent.
+    cloud-init stages contain modules and config-scripts-user contains the
+    whole bootstrap; the outer "bootstrap" span contains each step, and a
+    step contains the Ansible tasks it ran. Steps run by boot_orchestrator.py
+    overlap in time without nesting, so Ansible tasks are matched to their
+    step by name rather than by time alone.
+    """
+    if parent is child:
+        return False
+    if child['start'] < parent['start'] or child['end'] > parent['end']:
+        return False
+    if (child['end'] - child['start']) >= (parent['end'] - parent['start']):
+        return False
+
+    if parent['source'] == 'cloud-init':
+        return True
+    if parent['source'] == 'bootstrap':
+        if parent['name'] == 'bootstrap':
+            return True
+        if child['source'] == 'ansible':
+            return not child.get('step') or child['step'] == parent['name']
+    return False
+
+
+def find_leaf_spans(spans):
+    """
+    Return spans that contain no other span, i.e. the finest-grained unit of
+    work from any source.
+    """
+    return [span for span in spans if not any(is_parent(span, other) for other in spans)]
+
+
+def ancestors(spans, span):
+    """Return the spans containing span (see is_parent), innermost first."""
+    return sorted((s for s in spans if is_parent(s, span)), key=lambda s: s['end'] - s['start'])
+
+
+def owning_span(spans, leaf):
+    """
+    Return the non-Ansible span a leaf belongs to: the bootstrap step for an
+    Ansible task, otherwise the leaf itself.
+    """
+    for span in [leaf] + ancestors(spans, leaf):
+        if span['source'] != 'ansible':
+            return span
+    return None
+
+
+def overhead_span(parent, start, end):
+    """A gap on the critical path charged to parent (or untracked if None)."""
+    return {
+        'name': f"({parent['name']} overhead)" if parent else '(untracked)',
+        'source': 'gap',
+        'phase': parent['phase'] if parent else 'untracked',
+        'start': start,
+        'end': end,
+        'status': 'ok',
+    }
+
+
+def gap_spans(spans, start, end, previous, following):
+    """
+    Describe time on the critical path not covered by any leaf span.
+    The part that falls inside the step of the leaf before the gap (e.g.
+    script teardown) is charged to that step, the part inside the step of
+    the leaf after it (e.g. Ansible fact gathering) to that one. Whatever is
+    left, such as waiting between steps, goes to the innermost span that
+    contains both neighbours, or is reported as untracked. Concurrent steps
+    that merely overlap the gap in time are never charged.
+    """
+    gaps = []
+    before = owning_span(spans, previous) if previous else None
+    after = owning_span(spans, following) if following else None
+
+    if before and before['end'] > start:
+        split = min(before['end'], end)
+        gaps.append(overhead_span(before, start, split))
+        start = split
+
+    tail = None
+    if after and after['start'] < end and end > start:
+        split = max(after['start'], start)
+        tail = overhead_span(after, split, end)
+        end = split
+
+    if end - start > GAP_TOLERANCE_S:
+        neighbours = [n for n in (previous, following) if n]
+        common = [
+            s for s in ancestors(spans, neighbours[0])
+            if s['source'] != 'ansible'
+            and all(n is s or is_parent(s, n) for n in neighbours)
+            and s['start'] <= start + GAP_TOLERANCE_S
+            and s['end'] >= end - GAP_TOLERANCE_S
+        ] if neighbours else []
+        gaps.append(overhead_span(common[0] if common else None, start, end))
+
+    if tail:
+        gaps.append(tail)
+    return [g for g in gaps if g['end'] - g['start'] > GAP_TOLERANCE_S]
+
+
+def critical_path(spans, leaves):
+    """
+    Walk backwards from the last span to finish, each time picking the
+    latest-finishing span that ended before the current one started.
+    For a sequential boot this is simply the chain of leaves; when steps run
+    concurrently it follows the chain that actually gated boot completion.
+    Gaps between consecutive spans, and before the first / after the last,
+    are included so the path covers the whole boot.
+    """
+    if not leaves:
+        return []
+
+    ordered = sorted(leaves, key=lambda s: s['end'])
+    current = ordered[-1]
+    path = [current]
+
+    while True:
+        candidates = [s for s in ordered if s['end'] <= current['start'] + GAP_TOLERANCE_S and s is not current]
+        if not candidates:
+            break
+        current = max(candidates, key=lambda s: s['end'])
+        path.append(current)
+
+    path.reverse()
+
+    boot_start = min(s['start'] for s in spans)
+    boot_end = max(s['end'] for s in spans)
+
+    with_gaps = []
+    previous = None
+    previous_end = boot_start
+    for span in path:
+        if span['start'] - previous_end > GAP_TOLERANCE_S:
+            with_gaps.extend(gap_spans(spans, previous_end, span['start'], previous, span))
+        with_gaps.append(span)
+        previous = span
+        previous_end = span['end']
+
+    if boot_end - previous_end > GAP_TOLERANCE_S:
+        with_gaps.extend(gap_spans(spans, previous_end, boot_end, previous, None))
+
+    return with_gaps
+
+
+def summarize(spans):
+    """
+    Build the critical-path summary: total boot time, per-phase time on the
+    critical path, and the critical path itself.
+    """
+    leaves = find_leaf_spans(spans)
+    path = critical_path(spans, leaves)
+
+    boot_start = min(s['start'] for s in spans)
+    boot_end = max(s['end'] for s in spans)
+    total = boot_end - boot_start
+
+    phase_totals = defaultdict(float)
+    for span in path:
+        phase_totals[span['phase']] += span['end'] - span['start']
+
+    phases = sorted(phase_totals.items(), key=lambda x: x[1], reverse=True)
+
+    return {
+        'boot_start': datetime.fromtimestamp(boot_start, timezone.utc).isoformat(),
+        'total_seconds': round(total, 3),
+        'phases': [
+            {
+                'phase': phase,
+                'seconds': round(seconds, 3),
+                'percent': round(seconds / total * 100, 1) if total > 0 else 0,
+            }
+            for phase, seconds in phases
+        ],
+        'critical_path': [
+            {
+                'name': span['name'],
+                'source': span['source'],
+                'phase': span['phase'],
+                'offset_seconds': round(span['start'] - boot_start, 3),
+                'seconds': round(span['end'] - span['start'], 3),
+                'status': span['status'],
+            }
+            for span in path
+        ],
+    }
+
+
+def to_trace_events(spans):
+    """
+    Convert spans to Chrome trace-event format (complete "X" events).
+    Slices on one track must nest, so cloud-init and the outer bootstrap
+    span get a track each, every bootstrap step gets its own track (steps
+    run concurrently), and Ansible tasks go on the track of their step.
+    """
+    boot_start = min(s['start'] for s in spans)
+    tracks = {'cloud-init': 1, 'bootstrap': 2, 'ansible': 3}
+    step_tids = {}
+
+    def track(span):
+        if span['source'] == 'bootstrap' and span['name'] != 'bootstrap':
+            return step_tids.setdefault(span['name'], len(tracks) + len(step_tids) + 1)
+        if span['source'] == 'ansible':
+            step = owning_span(spans, span)
+            if step and step['source'] == 'bootstrap' and step['name'] != 'bootstrap':
+                return track(step)
+        return tracks.get(span['source'], 0)
+
+    ordered = sorted(spans, key=lambda s: (s['start'], -(s['end'] - s['start'])))
+    slices = []
+    for span in ordered:
+        slices.append({
+            'name': span['name'],
+            'cat': span['phase'],
+            'ph': 'X',
+            'pid': 1,
+            'tid': track(span),
+            'ts': round((span['start'] - boot_start) * 1_000_000),
+            'dur': round((span['end'] - span['start']) * 1_000_000),
+            'args': {'status': span['status'], 'phase': span['phase']},
+        })
+
+    names = dict((tid, source) for source, tid in tracks.items())
+    names.update((tid, name) for name, tid in step_tids.items())
+    events = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+        for tid, name in sorted(names.items())
+    ]
+    return events + slices
+
+
+def render_html(spans, summary):
+    """
+    Render a self-contained HTML timeline with one row per span plus the
+    critical-path table.
+    """
+    boot_start = min(s['start'] for s in spans)
+    total = max(summary['total_seconds'], 0.001)
+    colors = {'cloud-init': '#6c8ebf', 'bootstrap': '#d79b00', 'ansible': '#82b366'}
+
+    rows = []
+    for span in sorted(spans, key=lambda s: (s['start'], -(s['end'] - s['start']))):
+        left = (span['start'] - boot_start) / total * 100
+        width = max((span['end'] - span['start']) / total * 100, 0.1)
+        duration = span['end'] - span['start']
+        color = colors.get(span['source'], '#999') if span['status'] in ('ok', 'changed', 'skipped') else '#b85450'
+        rows.append(
+            f'<div class="row"><div class="label">{html.escape(span["name"])}</div>'
+            f'<div class="track"><div class="bar" style="left:{left:.3f}%;width:{width:.3f}%;background:{color}" '
+            f'title="{html.escape(span["phase"])} {duration:.2f}s"></div></div>'
+            f'<div class="dur">{duration:.2f}s</div></div>'
+        )
+
+    phase_rows = ''.join(
+        f'<tr><td>{html.escape(p["phase"])}</td><td>{p["seconds"]:.2f}s</td><td>{p["percent"]}%</td></tr>'
+        for p in summary['phases']
+    )
+
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Devbox boot profile</title>
+<style>
+body {{ font-family: sans-serif; font-size: 12px; margin: 20px; }}
+.row {{ display: flex; align-items: center; height: 16px; }}
+.label {{ width: 360px; overflow: hidden; white-space: nowrap; text-overflow: ellipsis; }}
+.track {{ flex: 1; position: relative; height: 12px; background: #f4f4f4; }}
+.bar {{ position: absolute; top: 0; height: 12px; }}
+.dur {{ width: 70px; text-align: right; }}
+table {{ border-collapse: collapse; margin-bottom: 20px; }}
+td, th {{ border: 1px solid #ddd; padding: 2px 8px; }}
+</style>
+</head>
+<body>
+<h1>Devbox boot profile</h1>
+<p>Boot started {html.escape(summary['boot_start'])}, total {summary['total_seconds']:.2f}s</p>
+<h2>Critical path by phase</h2>
+<table><tr><th>Phase</th><th>Time</th><th>Share</th></tr>{phase_rows}</table>
+<h2>Timeline</h2>
+{''.join(rows)}
+</body>
+</html>
+"""
+
+
+def print_summary(summary):
+    """Print the critical-path summary as text."""
+    print("=" * 80)
+    print(f"BOOT PROFILE (started {summary['boot_start']}, total {summary['total_seconds']:.2f}s)")
+    print("=" * 80)
+
+    print("\nCritical path by phase:")
+    for p in summary['phases']:
+        print(f"  {p['phase']:<30} {p['seconds']:>8.2f}s  {p['percent']:>5.1f}%")
+
+    print("\nCritical path:")
+    for step in summary['critical_path']:
+        print(f"  +{step['offset_seconds']:>7.2f}s  {step['seconds']:>7.2f}s  [{step['source']}] {step['name']} ({step['status']})")
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description='Profile the devbox boot pipeline (cloud-init, bootstrap scripts, Ansible tasks).',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s                                       # Print critical-path summary
+  %(prog)s --json boot.json --html boot.html     # Also write trace and timeline
+  %(prog)s --summary-json                        # Summary as JSON on stdout
+        '''
+    )
+
+    parser.add_argument('--cloud-init-log', default=DEFAULT_CLOUD_INIT_LOG,
+                        help=f'cloud-init log (default: {DEFAULT_CLOUD_INIT_LOG})')
+    parser.add_argument('--bootstrap-log', default=DEFAULT_BOOTSTRAP_LOG,
+                        help=f'bootstrap.sh timing log (default: {DEFAULT_BOOTSTRAP_LOG})')
+    parser.add_argument('--ansible-log', default=DEFAULT_ANSIBLE_LOG,
+                        help=f'Ansible callback timing log (default: {DEFAULT_ANSIBLE_LOG})')
+    parser.add_argument('--json', metavar='PATH',
+                        help='Write Chrome trace-event JSON (Perfetto / chrome://tracing)')
+    parser.add_argument('--html', metavar='PATH',
+                        help='Write a self-contained HTML timeline')
+    parser.add_argument('--summary-json', action='store_true',
+                        help='Print the critical-path summary as JSON instead of text')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+
+    spans = (
+        parse_cloud_init_log(args.cloud_init_log)
+        + parse_bootstrap_log(args.bootstrap_log)
+        + parse_ansible_log(args.ansible_log)
+    )
+
+    if not spans:
+        print("No timing data found", file=sys.stderr)
+        sys.exit(1)
+
+    summary = summarize(spans)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'traceEvents': to_trace_events(spans), 'summary': summary}, f, indent=2)
+
+    if args.html:
+        with open(args.html, 'w') as f:
+            f.write(render_html(spans, summary))
+
+    if args.summary_json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
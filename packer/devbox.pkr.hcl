@@ -0,0 +1,115 @@
+# Golden image for the devbox: everything that does not depend on the
+# instance (packages, Docker, Tailscale, Claude Code, systemd units, MOTD)
+# is installed by running the common role in "image" mode. At boot only the
+# per-instance steps run (ephemeral mount, users, SSH keys, restore).
+
+packer {
+  required_plugins {
+    amazon = {
+      source  = "github.com/hashicorp/amazon"
+      version = ">= 1.3.0"
+    }
+  }
+}
+
+variable "aws_region" {
+  description = "AWS region to build the image in"
+  type        = string
+  default     = "eu-west-2"
+}
+
+variable "image_version" {
+  description = "Image version, used in the AMI name (devbox-golden-<version>)"
+  type        = string
+}
+
+variable "instance_type" {
+  description = "Builder instance type (must be arm64 to match the Debian AMI)"
+  type        = string
+  default     = "t4g.medium"
+}
+
+variable "root_volume_size" {
+  description = "Root volume size in GB (match terraform/spot-asg root_volume_size)"
+  type        = number
+  default     = 16
+}
+
+source "amazon-ebs" "devbox" {
+  region        = var.aws_region
+  instance_type = var.instance_type
+  ami_name      = "devbox-golden-${var.image_version}"
+  ssh_username  = "debian"
+
+  # Same default user as cloud-init/userdata.yaml so UID 1000 is debian
+  user_data_file = "${path.root}/image-userdata.yaml"
+
+  source_ami_filter {
+    owners      = ["amazon"]
+    most_recent = true
+
+    filters = {
+      name                = "debian-12-arm64-*"
+      architecture        = "arm64"
+      virtualization-type = "hvm"
+    }
+  }
+
+  launch_block_device_mappings {
+    device_name           = "/dev/xvda"
+    volume_size           = var.root_volume_size
+    volume_type           = "gp3"
+    delete_on_termination = true
+  }
+
+  metadata_options {
+    http_endpoint               = "enabled"
+    http_tokens                 = "required"
+    http_put_response_hop_limit = 1
+  }
+
+  run_tags = {
+    Name    = "devbox-image-builder"
+    Project = "spot-dev-server"
+  }
+
+  tags = {
+    Name         = "devbox-golden-${var.image_version}"
+    Project      = "spot-dev-server"
+    ImageVersion = var.image_version
+  }
+}
+
+build {
+  sources = ["source.amazon-ebs.devbox"]
+
+  # Base tools normally installed by cloud-init
+  provisioner "shell" {
+    script          = "${path.root}/scripts/base.sh"
+    execute_command = "sudo -E bash '{{ .Path }}'"
+  }
+
+  provisioner "shell" {
+    inline = ["mkdir -p /tmp/bootstrap"]
+  }
+
+  provisioner "file" {
+    source      = "${path.root}/../bootstrap/"
+    destination = "/tmp/bootstrap"
+  }
+
+  # Instance-independent bootstrap scripts and the common role in image mode
+  provisioner "shell" {
+    script          = "${path.root}/scripts/bake.sh"
+    execute_command = "sudo -E bash '{{ .Path }}'"
+    environment_vars = [
+      "DEVBOX_IMAGE_VERSION=${var.image_version}",
+    ]
+  }
+
+  # Remove per-instance state so each launch starts clean
+  provisioner "shell" {
+    script          = "${path.root}/scripts/cleanup.sh"
+    execute_command = "sudo -E bash '{{ .Path }}'"
+  }
+}
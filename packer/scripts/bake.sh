@@ -0,0 +1,22 @@
+#!/bin/bash
+set -euo pipefail
+
+BOOTSTRAP_DIR="/opt/bootstrap"
+
+rm -rf "${BOOTSTRAP_DIR}"
+mv /tmp/bootstrap "${BOOTSTRAP_DIR}"
+chmod +x "${BOOTSTRAP_DIR}/bootstrap.sh" "${BOOTSTRAP_DIR}"/scripts/*.sh
+
+# Instance-independent bootstrap scripts (must run before the image marker exists)
+"${BOOTSTRAP_DIR}/scripts/10-install-tailscale.sh"
+"${BOOTSTRAP_DIR}/scripts/15-install-claude.sh"
+
+echo "Running Ansible playbook (mode: image)..."
+ansible-playbook \
+    -i "${BOOTSTRAP_DIR}/ansible/inventory.ini" \
+    -e "devbox_mode=image" \
+    -e "devbox_image_version=${DEVBOX_IMAGE_VERSION}" \
+    "${BOOTSTRAP_DIR}/ansible/site.yml"
+
+echo "Image provisioning complete"
+cat /etc/devbox-image
@@ -0,0 +1,37 @@
+#!/bin/bash
+set -euo pipefail
+
+echo "Waiting for cloud-init to finish..."
+cloud-init status --wait || true
+
+# Keep in sync with the packages list in cloud-init/userdata.yaml
+echo "Installing base packages..."
+export DEBIAN_FRONTEND=noninteractive
+apt-get update
+apt-get upgrade -y
+apt-get install -y \
+    curl \
+    jq \
+    unzip \
+    python3 \
+    python3-pip \
+    ansible \
+    ca-certificates \
+    gnupg \
+    restic \
+    rsync \
+    mdadm \
+    fio
+
+echo "Installing AWS CLI v2..."
+ARCH=$(uname -m)
+if [ "$ARCH" = "aarch64" ]; then
+    curl -fsSL "https://awscli.amazonaws.com/awscli-exe-linux-aarch64.zip" -o /tmp/awscliv2.zip
+else
+    curl -fsSL "https://awscli.amazonaws.com/awscli-exe-linux-x86_64.zip" -o /tmp/awscliv2.zip
+fi
+unzip -q /tmp/awscliv2.zip -d /tmp
+/tmp/aws/install
+rm -rf /tmp/aws /tmp/awscliv2.zip
+
+echo "Base packages installed"
@@ -0,0 +1,28 @@
+#!/bin/bash
+set -euo pipefail
+
+echo "Cleaning per-instance state..."
+
+# Bootstrap is re-synced from S3 at every boot
+rm -rf /opt/bootstrap
+
+# Tailscale node identity must be unique per instance
+systemctl stop tailscaled || true
+rm -f /var/lib/tailscale/tailscaled.state
+
+# SSH host keys come from SSM (or are regenerated by cloud-init)
+rm -f /etc/ssh/ssh_host_*
+
+# Packer's temporary key
+rm -f /home/debian/.ssh/authorized_keys
+
+apt-get clean
+rm -rf /var/lib/apt/lists/*
+
+rm -f /var/log/bootstrap-timings.log /var/log/bootstrap-ansible-timings.jsonl
+rm -rf /var/log/bootstrap
+
+truncate -s 0 /etc/machine-id
+cloud-init clean --logs
+
+echo "Cleanup complete"
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the EC2 instance metadata service (IMDSv2).
+
+Serves just enough of IMDS to exercise spot-interrupt: the session token,
+instance-id / instance-type, and spot interruption and rebalance notices
+that appear after a configurable delay.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN = 'fake-imds-token'
+
+
+def make_handler(args, started):
+    """Build a request handler bound to the command-line settings."""
+    started_wall = datetime.now(timezone.utc)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, body=''):
+            data = body.encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_PUT(self):
+            if self.path == '/latest/api/token':
+                self._send(200, TOKEN)
+            else:
+                self._send(404)
+
+        def do_GET(self):
+            if self.headers.get('X-aws-ec2-metadata-token') != TOKEN:
+                self._send(401)
+                return
+
+            elapsed = time.monotonic() - started
+            path = self.path.removeprefix('/latest/meta-data/')
+
+            if path == 'instance-id':
+                self._send(200, args.instance_id)
+            elif path == 'instance-type':
+                self._send(200, args.instance_type)
+            elif path == 'spot/instance-action':
+                if args.interrupt_after is not None and elapsed >= args.interrupt_after:
+                    notice_at = started_wall + timedelta(seconds=args.interrupt_after)
+                    action_time = notice_at + timedelta(seconds=args.notice_seconds)
+                    self._send(200, json.dumps({
+                        'action': args.action,
+                        'time': action_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    }))
+                else:
+                    self._send(404)
+            elif path == 'events/recommendations/rebalance':
+                if args.rebalance_after is not None and elapsed >= args.rebalance_after:
+                    notice_at = started_wall + timedelta(seconds=args.rebalance_after)
+                    self._send(200, json.dumps({'noticeTime': notice_at.strftime('%Y-%m-%dT%H:%M:%SZ')}))
+                else:
+                    self._send(404)
+            else:
+                self._send(404)
+
+        def log_message(self, format, *log_args):
+            print(f"{datetime.now(timezone.utc).isoformat()} {format % log_args}", flush=True)
+
+    return Handler
+
+
+def parse_arguments():
+    """
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description='Serve a minimal fake EC2 IMDSv2 with spot interruption notices.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s --interrupt-after 10                  # Termination notice after 10s
+  %(prog)s --rebalance-after 5 --interrupt-after 30 --notice-seconds 60
+        '''
+    )
+
+    parser.add_argument('--host', default='127.0.0.1', help='Listen address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8111, help='Listen port (default: 8111)')
+    parser.add_argument('--interrupt-after', type=float, default=None,
+                        help='Seconds after start before spot/instance-action appears')
+    parser.add_argument('--notice-seconds', type=float, default=120,
+                        help='Seconds between the notice and the action time (default: 120)')
+    parser.add_argument('--action', default='terminate', choices=['terminate', 'stop', 'hibernate'],
+                        help='Interruption action (default: terminate)')
+    parser.add_argument('--rebalance-after', type=float, default=None,
+                        help='Seconds after start before the rebalance recommendation appears')
+    parser.add_argument('--instance-id', default='i-0123456789abcdef0', help='Instance ID to report')
+    parser.add_argument('--instance-type', default='c8gd.medium', help='Instance type to report')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args, time.monotonic()))
+    print(f"Fake IMDS listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
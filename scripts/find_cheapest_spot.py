@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 import json
 import argparse
+import os
+import statistics
 import urllib.request
 import sys
 
@@ -29,6 +31,11 @@ EU_REGIONS = [
 # Interruption frequency ranges (index 0-4 maps to these labels)
 INTERRUPTION_RANGES = ['<5%', '5-10%', '10-15%', '15-20%', '>20%']
 
+# Without instance store, /home is on the gp3 root volume from
+# terraform/spot-asg/launch-template.tf, which sets no throughput and so gets
+# the gp3 default
+ROOT_VOLUME_THROUGHPUT_MBPS = 125
+
 # Cache for spot advisor data
 _spot_advisor_cache = None
 
@@ -90,10 +97,12 @@ def get_interruption_rate(spot_advisor_data, region, instance_type):
     return None
 
 
-def get_instance_types_with_specs(region, min_vcpu, min_memory_gb, min_storage_gb=None):
+def get_instance_types_with_specs(region, min_vcpu, min_memory_gb, min_storage_gb=None,
+                                  min_disk_count=None, min_network_gbps=None, min_ebs_throughput=None):
     """
-    Get all instance types in a region that meet minimum vCPU, memory, and optionally storage requirements.
-    Returns a dictionary with instance type details including storage info.
+    Get all instance types in a region that meet minimum vCPU, memory, and optionally storage,
+    disk count, network and EBS bandwidth requirements.
+    Returns a dictionary with instance type details including storage and bandwidth info.
     """
     ec2_client = boto3.client('ec2', region_name=region)
 
@@ -119,23 +128,50 @@ def get_instance_types_with_specs(region, min_vcpu, min_memory_gb, min_storage_g
                 # Extract ephemeral storage info
                 storage_info = "EBS only"
                 storage_gb = 0
+                disk_count = 0
+                disk_size_gb = 0
+                nvme = False
 
                 if 'InstanceStorageInfo' in instance_type:
                     storage = instance_type['InstanceStorageInfo']
                     if 'TotalSizeInGB' in storage:
                         storage_gb = storage['TotalSizeInGB']
-                        disk_type = storage.get('Disks', [{}])[0].get('Type', 'Unknown') if storage.get('Disks') else 'Unknown'
-                        storage_info = f"{storage_gb}GB ({disk_type})"
+                        disks = storage.get('Disks', [])
+                        disk_type = disks[0].get('Type', 'Unknown') if disks else 'Unknown'
+                        disk_count = sum(disk.get('Count', 1) for disk in disks)
+                        disk_size_gb = disks[0].get('SizeInGB', 0) if disks else 0
+                        nvme = storage.get('NvmeSupport') in ('required', 'supported')
+                        nvme_label = ", NVMe" if nvme else ""
+                        storage_info = f"{storage_gb}GB ({disk_count}x{disk_size_gb}GB {disk_type}{nvme_label})"
+
+                # Baseline (not burst) network and EBS bandwidth
+                network_cards = instance_type.get('NetworkInfo', {}).get('NetworkCards', [])
+                network_gbps = sum(card.get('BaselineBandwidthInGbps', 0) for card in network_cards)
+                ebs_info = instance_type.get('EbsInfo', {}).get('EbsOptimizedInfo', {})
+                ebs_throughput_mbps = ebs_info.get('BaselineThroughputInMBps', 0)
 
                 # Filter by minimum storage if specified
                 if min_storage_gb is not None:
                     if storage_gb < min_storage_gb:
                         continue  # Skip instances that don't meet storage requirement
 
+                # Filter by disk count and bandwidth if specified
+                if min_disk_count is not None and disk_count < min_disk_count:
+                    continue
+                if min_network_gbps is not None and network_gbps < min_network_gbps:
+                    continue
+                if min_ebs_throughput is not None and ebs_throughput_mbps < min_ebs_throughput:
+                    continue
+
                 matching_instances[instance_name] = {
                     'storage': storage_info,
                     'vcpu': actual_vcpu,
-                    'memory_gb': int(actual_memory_gb)
+                    'memory_gb': int(actual_memory_gb),
+                    'disk_count': disk_count,
+                    'disk_size_gb': disk_size_gb,
+                    'nvme': nvme,
+                    'network_gbps': network_gbps,
+                    'ebs_throughput_mbps': ebs_throughput_mbps
                 }
 
     except Exception as e:
@@ -255,6 +291,11 @@ def get_spot_prices(region, instance_types_info):
                 'storage': instance_types_info[instance_type]['storage'],
                 'vcpu': instance_types_info[instance_type]['vcpu'],
                 'memory_gb': instance_types_info[instance_type]['memory_gb'],
+                'disk_count': instance_types_info[instance_type]['disk_count'],
+                'disk_size_gb': instance_types_info[instance_type]['disk_size_gb'],
+                'nvme': instance_types_info[instance_type]['nvme'],
+                'network_gbps': instance_types_info[instance_type]['network_gbps'],
+                'ebs_throughput_mbps': instance_types_info[instance_type]['ebs_throughput_mbps'],
                 'timestamp': timestamp_str
             }
 
@@ -265,12 +306,65 @@ def get_spot_prices(region, instance_types_info):
     return list(spot_prices.values())
 
 
+def load_benchmarks(source):
+    """
+    Load storage benchmark results recorded at boot by
+    bootstrap/scripts/95-benchmark-storage.sh (one JSON file per instance).
+    source is a local directory or an s3://bucket/prefix URL.
+    Returns a dictionary mapping instance type -> median results across runs,
+    where throughput_mbps is the mean of sequential read and write.
+    """
+    results = []
+
+    try:
+        if source.startswith('s3://'):
+            bucket, _, prefix = source[len('s3://'):].partition('/')
+            s3_client = boto3.client('s3')
+            paginator = s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+                for item in page.get('Contents', []):
+                    if item['Key'].endswith('.json'):
+                        body = s3_client.get_object(Bucket=bucket, Key=item['Key'])['Body'].read()
+                        results.append(json.loads(body))
+        else:
+            for dirpath, _, filenames in os.walk(source):
+                for filename in filenames:
+                    if filename.endswith('.json'):
+                        with open(os.path.join(dirpath, filename)) as f:
+                            results.append(json.load(f))
+    except Exception as e:
+        if not _quiet_mode:
+            print(f"Warning: Could not load storage benchmarks from {source}: {e}", file=sys.stderr)
+
+    runs_by_type = defaultdict(list)
+    for result in results:
+        if 'instance_type' in result and 'seq_read_mbps' in result:
+            runs_by_type[result['instance_type']].append(result)
+
+    benchmarks = {}
+    for instance_type, runs in runs_by_type.items():
+        benchmarks[instance_type] = {
+            'throughput_mbps': statistics.median((r['seq_read_mbps'] + r['seq_write_mbps']) / 2 for r in runs),
+            'seq_read_mbps': statistics.median(r['seq_read_mbps'] for r in runs),
+            'seq_write_mbps': statistics.median(r['seq_write_mbps'] for r in runs),
+            'rand_read_iops': statistics.median(r['rand_read_iops'] for r in runs),
+            'rand_write_iops': statistics.median(r['rand_write_iops'] for r in runs),
+            'runs': len(runs)
+        }
+
+    return benchmarks
+
+
 def find_cheapest_spot_instance(vcpu, memory_gb, min_storage_gb=None, preferred_region=None,
-                                 json_output=False, min_placement_score=None, max_interruption=None):
+                                 json_output=False, min_placement_score=None, max_interruption=None,
+                                 min_disk_count=None, min_network_gbps=None, min_ebs_throughput=None,
+                                 sort_by='price', benchmarks_source=None):
     """
     Find the cheapest spot instance across all European regions.
     Optionally highlights results for a preferred region.
-    Supports filtering by minimum placement score and maximum interruption rate.
+    Supports filtering by minimum placement score, maximum interruption rate,
+    disk count and network/EBS bandwidth, and ranking by price per GB/s of
+    storage throughput instead of price.
     """
     global _quiet_mode
     _quiet_mode = json_output
@@ -286,6 +380,12 @@ def find_cheapest_spot_instance(vcpu, memory_gb, min_storage_gb=None, preferred_
         filter_msgs.append(f"placement score >= {min_placement_score}")
     if max_interruption:
         filter_msgs.append(f"interruption <= {max_interruption}%")
+    if min_disk_count:
+        filter_msgs.append(f"disks >= {min_disk_count}")
+    if min_network_gbps:
+        filter_msgs.append(f"network >= {min_network_gbps} Gbps")
+    if min_ebs_throughput:
+        filter_msgs.append(f"EBS >= {min_ebs_throughput} MB/s")
     filter_msg = f" [filters: {', '.join(filter_msgs)}]" if filter_msgs else ""
     log(f"Searching for cheapest spot instance with at least {vcpu} vCPUs, {memory_gb}GB RAM{storage_msg} in European regions{preferred_msg}{filter_msg}...\n")
 
@@ -296,7 +396,8 @@ def find_cheapest_spot_instance(vcpu, memory_gb, min_storage_gb=None, preferred_
         log(f"Checking {region}...")
 
         # Get instance types that match our specs
-        instance_types = get_instance_types_with_specs(region, vcpu, memory_gb, min_storage_gb)
+        instance_types = get_instance_types_with_specs(region, vcpu, memory_gb, min_storage_gb,
+                                                       min_disk_count, min_network_gbps, min_ebs_throughput)
 
         if not instance_types:
             log(f"  No matching instance types found in {region}")
@@ -359,6 +460,30 @@ def find_cheapest_spot_instance(vcpu, memory_gb, min_storage_gb=None, preferred_
             price_info['interruption_frequency'] = 'N/A'
             price_info['interruption_max_percent'] = 100
 
+    # Storage throughput: measured ephemeral throughput where a benchmark
+    # exists for the instance type, the root volume's throughput (capped by
+    # the instance's EBS baseline) for EBS-only types, and unknown for
+    # instance-store types that have not been measured yet
+    benchmarks = {}
+    if benchmarks_source:
+        log("\nLoading storage benchmarks...")
+        benchmarks = load_benchmarks(benchmarks_source)
+        log(f"  Loaded benchmarks for {len(benchmarks)} instance types")
+
+    for price_info in all_prices:
+        measured = benchmarks.get(price_info['instance_type'])
+        if measured:
+            price_info['throughput_mbps'] = measured['throughput_mbps']
+            price_info['throughput_source'] = f"measured, {measured['runs']} runs"
+        elif price_info['disk_count'] == 0:
+            price_info['throughput_mbps'] = min(price_info['ebs_throughput_mbps'], ROOT_VOLUME_THROUGHPUT_MBPS)
+            price_info['throughput_source'] = 'gp3 root volume'
+        else:
+            price_info['throughput_mbps'] = None
+            price_info['throughput_source'] = 'not measured'
+        throughput_gbps = (price_info['throughput_mbps'] or 0) / 1000
+        price_info['price_per_gbps'] = price_info['price'] / throughput_gbps if throughput_gbps else None
+
     # Apply filters
     filtered_prices = all_prices
 
@@ -385,14 +510,33 @@ def find_cheapest_spot_instance(vcpu, memory_gb, min_storage_gb=None, preferred_
             print("\nNo instances match the specified filters!")
         return
 
-    # Sort by price
-    filtered_prices.sort(key=lambda x: x['price'])
+    # Sort by price, or by price per GB/s (instances with unknown throughput
+    # last). rank_key names the JSON keys so they say what was ranked.
+    if sort_by == 'price-per-gbps':
+        filtered_prices.sort(key=lambda x: (x['price_per_gbps'] is None, x['price_per_gbps'] or 0, x['price']))
+        rank_label = "BEST PRICE PER GB/S"
+        rank_key = "best"
+    else:
+        filtered_prices.sort(key=lambda x: x['price'])
+        rank_label = "CHEAPEST"
+        rank_key = "cheapest"
 
     # Prepare results
     cheapest = filtered_prices[0]
     preferred_prices = [p for p in filtered_prices if p['region'] == preferred_region] if preferred_region else []
     cheapest_preferred = preferred_prices[0] if preferred_prices else None
 
+    # How much worse the preferred region's top pick is on the ranked metric
+    comparison = None
+    if cheapest_preferred and cheapest_preferred is not cheapest:
+        if sort_by == 'price-per-gbps':
+            preferred_value, best_value = cheapest_preferred['price_per_gbps'], cheapest['price_per_gbps']
+        else:
+            preferred_value, best_value = cheapest_preferred['price'], cheapest['price']
+        if preferred_value is not None and best_value and preferred_value != best_value:
+            diff = preferred_value - best_value
+            comparison = (diff, (diff / best_value) * 100)
+
     # JSON output mode
     if json_output:
         def format_instance(price_info):
@@ -406,6 +550,16 @@ def find_cheapest_spot_instance(vcpu, memory_gb, min_storage_gb=None, preferred_
                 "placement_score": price_info['placement_score'],
                 "interruption_frequency": price_info['interruption_frequency'],
                 "ephemeral_storage": price_info['storage'],
+                "disk_count": price_info['disk_count'],
+                "disk_size_gb": price_info['disk_size_gb'],
+                "nvme": price_info['nvme'],
+                "network_gbps": price_info['network_gbps'],
+                "ebs_throughput_mbps": price_info['ebs_throughput_mbps'],
+                "storage_throughput": {
+                    "mbps": price_info['throughput_mbps'],
+                    "source": price_info['throughput_source'],
+                    "price_per_gbps_hourly": round(price_info['price_per_gbps'], 4) if price_info['price_per_gbps'] is not None else None
+                },
                 "pricing": {
                     "current": {
                         "hourly": round(price_info['price'], 4),
@@ -426,37 +580,51 @@ def find_cheapest_spot_instance(vcpu, memory_gb, min_storage_gb=None, preferred_
             }
 
         result = {
-            "cheapest_overall": format_instance(cheapest),
+            "sort_by": sort_by,
+            f"{rank_key}_overall": format_instance(cheapest),
             "top_10_all_regions": [format_instance(p) for p in filtered_prices[:10]]
         }
 
         # Include applied filters in output
-        if min_placement_score or max_interruption:
+        if min_placement_score or max_interruption or min_disk_count or min_network_gbps or min_ebs_throughput:
             result["filters"] = {}
             if min_placement_score:
                 result["filters"]["min_placement_score"] = min_placement_score
             if max_interruption:
                 result["filters"]["max_interruption_percent"] = max_interruption
+            if min_disk_count:
+                result["filters"]["min_disk_count"] = min_disk_count
+            if min_network_gbps:
+                result["filters"]["min_network_gbps"] = min_network_gbps
+            if min_ebs_throughput:
+                result["filters"]["min_ebs_throughput_mbps"] = min_ebs_throughput
 
         if preferred_region:
             result["preferred_region"] = preferred_region
             if cheapest_preferred:
-                result["cheapest_in_preferred_region"] = format_instance(cheapest_preferred)
+                result[f"{rank_key}_in_preferred_region"] = format_instance(cheapest_preferred)
                 result["top_10_preferred_region"] = [format_instance(p) for p in preferred_prices[:10]]
-                if cheapest_preferred['price'] != cheapest['price']:
-                    diff = cheapest_preferred['price'] - cheapest['price']
-                    result["preferred_vs_cheapest"] = {
-                        "difference_hourly": round(diff, 4),
-                        "difference_pct": round((diff / cheapest['price']) * 100, 1)
+                if comparison:
+                    diff, diff_pct = comparison
+                    result[f"preferred_vs_{rank_key}"] = {
+                        ("difference_per_gbps_hourly" if sort_by == 'price-per-gbps' else "difference_hourly"): round(diff, 4),
+                        "difference_pct": round(diff_pct, 1)
                     }
             else:
-                result["cheapest_in_preferred_region"] = None
+                result[f"{rank_key}_in_preferred_region"] = None
                 result["top_10_preferred_region"] = []
 
         print(json.dumps(result, indent=2))
         return
 
     # Text output mode
+    def format_throughput(price_info):
+        """Format storage throughput and price per GB/s."""
+        if price_info['price_per_gbps'] is None:
+            return f"unknown ({price_info['throughput_source']})"
+        return (f"{price_info['throughput_mbps']:.0f} MB/s ({price_info['throughput_source']}) | "
+                f"${price_info['price_per_gbps']:.4f}/hour per GB/s")
+
     def print_instance_list(prices, title, count=10):
         """Helper to print a list of instances."""
         print("\n" + "="*100)
@@ -481,6 +649,8 @@ def find_cheapest_spot_instance(vcpu, memory_gb, min_storage_gb=None, preferred_
             print(f"   Region: {price_info['region']} (Placement Score: {score_str}, Interruption: {interruption})")
             print(f"   Availability Zone: {price_info['availability_zone']}")
             print(f"   Ephemeral Storage: {price_info['storage']}")
+            print(f"   Bandwidth: {price_info['network_gbps']} Gbps network | {price_info['ebs_throughput_mbps']} MB/s EBS")
+            print(f"   Storage Throughput: {format_throughput(price_info)}")
             print(f"   Last Updated: {price_info['timestamp']} ({price_info['data_points']} data points)")
 
     def print_cheapest(price_info, title):
@@ -502,23 +672,27 @@ def find_cheapest_spot_instance(vcpu, memory_gb, min_storage_gb=None, preferred_
         print(f"Placement Score: {score_str}")
         print(f"Interruption Frequency: {interruption}")
         print(f"Ephemeral Storage: {price_info['storage']}")
+        print(f"Bandwidth: {price_info['network_gbps']} Gbps network | {price_info['ebs_throughput_mbps']} MB/s EBS")
+        print(f"Storage Throughput: {format_throughput(price_info)}")
         print(f"Last Updated: {price_info['timestamp']}")
 
     # Display results for all regions
-    print_instance_list(filtered_prices, "TOP 10 CHEAPEST SPOT INSTANCES (ALL REGIONS)")
-    print_cheapest(cheapest, "CHEAPEST OPTION (ALL REGIONS)")
+    print_instance_list(filtered_prices, f"TOP 10 {rank_label} SPOT INSTANCES (ALL REGIONS)")
+    print_cheapest(cheapest, f"{rank_label} OPTION (ALL REGIONS)")
 
     # If preferred region specified, also show results for that region
     if preferred_region:
         if preferred_prices:
-            print_instance_list(preferred_prices, f"TOP 10 CHEAPEST SPOT INSTANCES IN {preferred_region.upper()}")
-            print_cheapest(cheapest_preferred, f"CHEAPEST OPTION IN {preferred_region.upper()}")
-
-            # Show price comparison
-            if cheapest_preferred['price'] != cheapest['price']:
-                diff = cheapest_preferred['price'] - cheapest['price']
-                diff_pct = (diff / cheapest['price']) * 100
-                print(f"\nNote: Preferred region is ${diff:.4f}/hour ({diff_pct:.1f}%) more expensive than the cheapest option.")
+            print_instance_list(preferred_prices, f"TOP 10 {rank_label} SPOT INSTANCES IN {preferred_region.upper()}")
+            print_cheapest(cheapest_preferred, f"{rank_label} OPTION IN {preferred_region.upper()}")
+
+            # Show comparison on the ranked metric
+            if comparison:
+                diff, diff_pct = comparison
+                if sort_by == 'price-per-gbps':
+                    print(f"\nNote: Preferred region costs ${diff:.4f}/hour per GB/s ({diff_pct:.1f}%) more than the best option.")
+                else:
+                    print(f"\nNote: Preferred region is ${diff:.4f}/hour ({diff_pct:.1f}%) more expensive than the cheapest option.")
         else:
             print(f"\nNo spot prices found in preferred region {preferred_region}")
 
@@ -542,6 +716,8 @@ Examples:
   %(prog)s -c 4 -m 8 --min-score 7               # Only instances with placement score >= 7
   %(prog)s -c 4 -m 8 --max-interruption 10       # Only instances with interruption <= 10%%
   %(prog)s -c 4 -m 8 -p 8 -i 5 -j                # Combined filters with JSON output
+  %(prog)s -c 8 -m 16 --min-disk-count 2 --min-network-gbps 10
+  %(prog)s -c 8 -m 16 -s 300 --sort price-per-gbps --benchmarks s3://BUCKET/benchmarks
         '''
     )
 
@@ -598,6 +774,44 @@ Examples:
         help='Maximum interruption frequency (5, 10, 15, or 20 percent)'
     )
 
+    parser.add_argument(
+        '--min-disk-count',
+        type=int,
+        default=None,
+        help='Minimum number of instance store disks'
+    )
+
+    parser.add_argument(
+        '--min-network-gbps',
+        type=float,
+        default=None,
+        help='Minimum baseline network bandwidth in Gbps'
+    )
+
+    parser.add_argument(
+        '--min-ebs-throughput',
+        type=int,
+        default=None,
+        metavar='MBPS',
+        help='Minimum baseline EBS throughput in MB/s'
+    )
+
+    parser.add_argument(
+        '--sort',
+        default='price',
+        choices=['price', 'price-per-gbps'],
+        help='Rank by spot price or by price per GB/s of storage throughput (default: price)'
+    )
+
+    parser.add_argument(
+        '--benchmarks',
+        type=str,
+        default=None,
+        metavar='SOURCE',
+        help='Directory or s3://bucket/prefix with storage benchmark results (from 95-benchmark-storage.sh); '
+             'without it, instance-store throughput is unknown and EBS-only types use the gp3 root volume'
+    )
+
     return parser.parse_args()
 
 
@@ -611,7 +825,12 @@ if __name__ == '__main__':
             args.preferred_region,
             args.json,
             args.min_score,
-            args.max_interruption
+            args.max_interruption,
+            args.min_disk_count,
+            args.min_network_gbps,
+            args.min_ebs_throughput,
+            args.sort,
+            args.benchmarks
         )
     except Exception as e:
         if hasattr(args, 'json') and args.json:
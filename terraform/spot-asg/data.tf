@@ -19,6 +19,26 @@ data "aws_ami" "debian" {
   }
 }
 
+# Golden image built by packer/ ("latest" picks the newest devbox-golden-*)
+data "aws_ami" "golden" {
+  count       = var.golden_image_version != "" ? 1 : 0
+  most_recent = true
+  owners      = ["self"]
+
+  filter {
+    name   = "name"
+    values = [var.golden_image_version == "latest" ? "devbox-golden-*" : "devbox-golden-${var.golden_image_version}"]
+  }
+}
+
+locals {
+  image_id   = var.golden_image_version != "" ? data.aws_ami.golden[0].id : data.aws_ami.debian.id
+  image_name = var.golden_image_version != "" ? data.aws_ami.golden[0].name : data.aws_ami.debian.name
+
+  # Golden images have packages baked in, so their userdata skips apt
+  user_data_file = var.golden_image_version != "" ? "userdata-golden.yaml" : "userdata.yaml"
+}
+
 # Get default VPC
 data "aws_vpc" "default" {
   default = true
@@ -1,11 +1,11 @@
 resource "aws_launch_template" "devbox" {
   name          = "devbox-spot-lt"
   description   = "Launch template for devbox spot instances"
-  image_id      = data.aws_ami.debian.id
+  image_id      = local.image_id
   instance_type = var.instance_type
   key_name      = var.key_name
 
-  user_data = base64encode(file("${path.module}/../../cloud-init/userdata.yaml"))
+  user_data = base64encode(file("${path.module}/../../cloud-init/${local.user_data_file}"))
 
   iam_instance_profile {
     name = data.aws_iam_instance_profile.devbox.name
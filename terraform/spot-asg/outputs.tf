@@ -25,10 +25,10 @@ output "security_group_id" {
 
 output "ami_id" {
   description = "AMI ID used"
-  value       = data.aws_ami.debian.id
+  value       = local.image_id
 }
 
 output "ami_name" {
   description = "AMI name"
-  value       = data.aws_ami.debian.name
+  value       = local.image_name
 }
@@ -10,6 +10,12 @@ variable "instance_type" {
   default     = "c8gd.medium"
 }
 
+variable "golden_image_version" {
+  description = "Golden image version to launch (devbox-golden-<version>), \"latest\" for the newest, or empty for stock Debian"
+  type        = string
+  default     = ""
+}
+
 variable "key_name" {
   description = "SSH key pair name"
   type        = string